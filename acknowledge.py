@@ -0,0 +1,100 @@
+import random
+import asyncio
+import numpy as np
+import tts
+
+# Configuration
+ACK_DEADLINE_S = 0.7  # Play the acknowledgement only if the answer hasn't started by then
+ACK_MODE = "earcon"  # "earcon" (two soft tones) or "phrase" (a cached spoken filler, earcon if none)
+ACK_PHRASES = ["Mm-hm.", "One sec.", "Let me see."]  # Pre-warmed into the phrase cache at startup
+CROSSFADE_S = 0.03
+GUARD_S = 0.05  # Audio just ahead of the speaker that may already be in the device's hands
+
+EARCON_TONES_HZ = (660, 880)
+EARCON_TONE_S = 0.09
+EARCON_LEVEL = 0.2
+
+
+def earcon(rate=tts.SAMPLE_RATE):
+    """Two short rising tones with raised-cosine edges, as int16."""
+    n = int(EARCON_TONE_S * rate)
+    t = np.arange(n) / rate
+    envelope = np.sin(np.pi * np.arange(n) / n) ** 2
+    tones = [np.sin(2 * np.pi * f * t) * envelope for f in EARCON_TONES_HZ]
+    return (np.concatenate(tones) * EARCON_LEVEL * 32767).astype(np.int16)
+
+
+_EARCON = earcon()
+
+
+class Acknowledger:
+    """
+    Masks the silence between end of speech and the first sentence of the answer.
+    arm() starts a deadline; if no answer audio has been queued when it expires, a short
+    clip (earcon or cached phrase, straight from memory) goes into the playback ring.
+    When the answer's first chunk arrives, take_over() takes back the unplayed part of
+    the clip and cross-fades it into the answer, so the two never play on top of each
+    other or back to back with a gap.
+    """
+
+    def __init__(self, voice, deadline_s=ACK_DEADLINE_S, mode=ACK_MODE):
+        self.voice = voice
+        self.deadline_s = deadline_s
+        self.mode = mode
+        self.answered = False
+        self.start_pos = None  # Ring span of the clip, once queued
+        self.end_pos = None
+        self._task = None
+
+    def _clip(self):
+        if self.mode == "phrase":
+            cached = []
+            for text in ACK_PHRASES:
+                key = tts.router.engines[0].cache_key(self.voice)
+                if tts.cache.has(text, *key):
+                    cached.append((text, key))
+            if cached:
+                text, key = random.choice(cached)
+                return np.frombuffer(tts.cache.get(text, *key), dtype=np.int16)
+        return _EARCON
+
+    async def _play_after_deadline(self):
+        await asyncio.sleep(self.deadline_s)
+        if self.answered:
+            return
+        clip = self._clip()
+        self.start_pos = tts.mark()
+        self.end_pos = self.start_pos + len(clip)
+        await tts.enqueue(clip)
+
+    def arm(self):
+        """Starts the deadline (call at end of speech)."""
+        self.answered = False
+        self.start_pos = self.end_pos = None
+        self._task = asyncio.create_task(self._play_after_deadline())
+
+    def take_over(self, samples):
+        """
+        Called with the answer's first chunk before it is queued. Returns what to queue
+        instead: the chunk cross-faded with the clip's remaining audio, if any is left.
+        """
+        self.answered = True
+        self.cancel()
+        if self.start_pos is None:
+            return samples
+
+        end = min(self.end_pos, tts.mark())  # Less if the clip was cut short while being queued
+        guard = int(GUARD_S * tts.SAMPLE_RATE)
+        cut = tts.playback.rewind(self.start_pos, guard)
+        if cut >= end:
+            return samples  # The whole clip is already (about to be) heard
+
+        fade = min(int(CROSSFADE_S * tts.SAMPLE_RATE), end - cut, len(samples))
+        tail = tts.playback.read(cut, fade).astype(np.float32)
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        mixed = tail * (1.0 - ramp) + samples[:fade].astype(np.float32) * ramp
+        return np.concatenate([mixed.astype(np.int16), samples[fade:]])
+
+    def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
@@ -0,0 +1,59 @@
+import atexit
+import sounddevice as sd
+from ring_buffer import SharedAudioRing
+
+# Constants
+RATE = 16000
+CHANNELS = 1
+DTYPE = "int16"
+BLOCK_SIZE = 480  # 30 ms, matches the VAD frame size
+RING_SECONDS = 30  # How much history consumers can look back on
+
+# One always-on microphone shared by the wake word detector and the VAD.
+# Each consumer reads from the ring at its own offset, so audio spoken between
+# the wake word firing and the command listener starting is never lost.
+# The ring lives in shared memory so the wake word worker process can read it too.
+ring = SharedAudioRing(RATE * RING_SECONDS)
+atexit.register(ring.close)
+_stream = None
+
+def audio_callback(indata, frames, time, status):
+    if status:
+        print("Mic status:", status)
+    ring.write(indata[:, 0])  # Lock-free: a reader can never stall this realtime thread
+
+def start_capture():
+    """Opens the microphone once and keeps it running."""
+    global _stream
+    if _stream is None:
+        _stream = sd.InputStream(
+            samplerate=RATE,
+            channels=CHANNELS,
+            dtype=DTYPE,
+            callback=audio_callback,
+            blocksize=BLOCK_SIZE,
+        )
+        _stream.start()
+        print("🎤 Microphone capture started")
+
+def stop_capture():
+    """Closes the shared microphone stream."""
+    global _stream
+    if _stream is not None:
+        _stream.stop()
+        _stream.close()
+        _stream = None
+        print("🎤 Microphone capture stopped")
+
+def get_reader(start=None):
+    """
+    Returns a reader on the shared capture ring, starting the microphone if needed.
+    Args:
+        start: Absolute sample position to start from. Defaults to 'now'.
+    """
+    start_capture()
+    return ring.reader(start)
+
+def input_latency():
+    """Input latency of the capture stream in seconds (0 if not running)."""
+    return _stream.latency if _stream is not None else 0.0
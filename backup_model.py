@@ -2,26 +2,37 @@ from dotenv import load_dotenv
 from langgraph.prebuilt import create_react_agent
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
+from langchain_core.messages import HumanMessage
 import asyncio
-import re
-from tts import speak_async, start_stream, stop_stream, wait_until_done
-from stt_vad import take_command
+import contextlib
+from tts import start_stream, stop_stream, wait_until_done, flush, cache
+import stt_vad
+from stt_vad import take_command, take_command_async
+from tts_scheduler import SpeechScheduler
+from acknowledge import Acknowledger, ACK_PHRASES
 import wakeword
-from langgraph.checkpoint.memory import InMemorySaver
+import audio_capture
+import barge_in
+import threading
+from memory import ConversationMemory, open_checkpointer, close_checkpointer, load_history, commit_turn, close_turn, INTERRUPTED_NOTE, THREAD_ID
 
 # Import all tools
-from tools import ALL_TOOLS, control_wled_impl, control_wled
+from tools import ALL_TOOLS, SIDE_EFFECT_TOOLS, control_wled_impl, control_wled
+from hedging import hedged, guard_tools
+import tool_pool
+from tool_pool import concurrent_tools
+import intents
+from wled import WLEDClient
+from text_segmenter import MarkupFilter, SpeechSegmenter, segment
+from warmup import StartupTimeline, warm_up, warm_groq, warm_ollama, warm_tts
 
 load_dotenv()
 
-model = ChatGroq(model='openai/gpt-oss-20b')
-ollama_model = ChatOllama(model='qwen3:4b')
-checkpointer = InMemorySaver()
+# Groq and Ollama may run at the same time (hedging): only the winner gets to run side-effecting tools.
+# Several tool calls in one model step run side by side, each with a timeout.
+TOOLS = concurrent_tools(guard_tools(ALL_TOOLS, SIDE_EFFECT_TOOLS))
 
-agent_groq = create_react_agent(
-    model=model,
-    tools=ALL_TOOLS,
-    prompt = """
+PROMPT_GROQ = """
 You are Nova, a calm, witty, and exceptionally human-like voice assistant. 
 Your voice is being powered by a high-quality local TTS system that handles pauses and breathing very well.
 
@@ -33,14 +44,9 @@ Speaking Guidelines:
 - **Action-Oriented**: Perform the action first, then confirm. If an action takes time, say something like "On it..." immediately.
 
 Your goal is to be a helpful companion who is easy to talk to and sounds like a real person over the phone or in the room.
-""",
-    checkpointer=checkpointer
-)
-
-agent_ollama = create_react_agent(
-    model=ollama_model,
-    tools=ALL_TOOLS,
-    prompt = """
+"""
+
+PROMPT_OLLAMA = """
 You are a friendly, voice-first AI assistant. You sound calm, witty, and approachable—never robotic.
 
 Voice Response Rules:
@@ -49,145 +55,259 @@ Voice Response Rules:
 3. **Think Aloud**: Use words like "Hmm," "Let's see," or "Wait, let me check..." to sound like a co-pilot.
 4. **Vibe Check**: Match the user's energy and be empathetic when needed.
 5. **Efficiency**: Execute commands immediately and give a concise, warm update.
-""",
-    checkpointer=checkpointer
-)
-
-config = {"configurable": {"thread_id": "2"}}
-
-def clean_text_for_tts(text: str) -> str:
-    """Removes markdown and other TTS-unfriendly characters."""
-    # Remove ellipses (user requested)
-    text = text.replace('...', ' ').replace('..', ' ')
-    # Remove code blocks
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-    # Remove inline code
-    text = re.sub(r'`.*?`', '', text)
-    # Remove bold/italic
-    text = re.sub(r'\*\*|\*', '', text)
-    # Remove think blocks
-    text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-    # Clean up excess whitespace
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+"""
+
+config = {"configurable": {"thread_id": THREAD_ID}}
+
+# Built by setup() inside main_loop: the SQLite checkpointer needs the running event loop
+model = None
+ollama_model = None
+checkpointer = None
+memory = None  # Keeps the thread within its token budget
+history_graph = None  # Owns the thread in the checkpointer: its state is read and written, it's never run
+agent_groq = None  # The agents are stateless: a lane that loses the race leaves no trace in the thread
+agent_ollama = None
+
+async def setup():
+    """Opens the conversation database and builds the models and agents."""
+    global model, ollama_model, checkpointer, memory, history_graph, agent_groq, agent_ollama
+    model = ChatGroq(model='openai/gpt-oss-20b')
+    ollama_model = ChatOllama(model='qwen3:4b')
+    checkpointer = await open_checkpointer()  # SQLite (WAL): history survives restarts
+    memory = ConversationMemory([model, ollama_model])
+    history_graph = create_react_agent(model=model, tools=TOOLS, checkpointer=checkpointer)
+
+    agent_groq = create_react_agent(
+        model=model,
+        tools=TOOLS,
+        prompt=PROMPT_GROQ,
+        pre_model_hook=memory.hook(PROMPT_GROQ)
+    )
+
+    agent_ollama = create_react_agent(
+        model=ollama_model,
+        tools=TOOLS,
+        prompt=PROMPT_OLLAMA,
+        pre_model_hook=memory.hook(PROMPT_OLLAMA)
+    )
+
+# Decode while the user is still speaking (partials), so only a short tail is left at end-of-speech
+STREAMING_STT = True
+
+# Keep listening while Nova speaks; talking over her cuts the answer short and starts a new turn
+BARGE_IN = True
+
+VOICE = 'en-Davis_man'
+FALLBACK_REPLY = "Sorry, all models failed to respond... 😅"
+
+# Said often enough to keep synthesized in the TTS phrase cache (synthesized in the background at startup)
+PREWARM_PHRASES = [FALLBACK_REPLY, "On it.", "Done.", "Sure.", "Okay.", "All set."] + ACK_PHRASES
+
+async def _agent_stream(agent, history, turn, state):
+    """
+    Streams one agent's answer text, without <think> blocks, code or markdown emphasis.
+    The agent runs on history + turn; state["messages"] follows its latest full state
+    and state["partial"] the text streamed since then.
+    """
+    markup = MarkupFilter()  # Handles tags split across chunks
+    async for mode, event in agent.astream(
+        {"messages": [*history, turn]},
+        stream_mode=["messages", "values"]
+    ):
+        if mode == "values":
+            state["messages"] = event["messages"]
+            state["partial"] = ""
+            continue
+        chunk, metadata = event
+        if metadata.get("langgraph_node") == "agent":
+            content = chunk.content
+            if not content:
+                continue
+
+            visible = markup.feed(content)
+            if visible:
+                state["partial"] = state.get("partial", "") + visible
+                yield visible
+    visible = markup.flush()
+    if visible:
+        yield visible
 
 async def stream_with_fallback(user_input: str):
     """
-    Streams updates from Groq, falls back to Ollama if an error occurs.
+    Streams from Groq, hedged with Ollama: Ollama is also asked if Groq fails or has
+    produced nothing within HEDGE_BUDGET_S, and whichever speaks first is kept.
     Eliminates <think> tags from the stream.
+    Known device commands ("lights red", "what time is it") skip the LLM entirely.
+    Only the winner's messages are added to the conversation; if the user talks over
+    the answer, what was said so far is kept and open tool calls are closed.
     """
-    for agent in [agent_groq, agent_ollama]:
-        try:
-            full_response = ""
-            in_think_block = False
-            
-            async for event in agent.astream(
-                {"messages": [{"role": "user", "content": user_input}]},
-                config,
-                stream_mode="messages"
-            ):
-                chunk, metadata = event
-                if metadata.get("langgraph_node") == "agent":
-                    content = chunk.content
-                    if not content:
-                        continue
-                        
-                    if "<think>" in content:
-                        in_think_block = True
-                        content = content.split("<think>")[-1]
-                    if "</think>" in content:
-                        in_think_block = False
-                        content = content.split("</think>")[-1]
-                    
-                    if not in_think_block and content:
-                        yield content
-                        full_response += content
-            
-            if full_response:
-                return 
-        except Exception as e:
-            print(f"Agent failed: {e}")
-            continue
-    yield "Sorry, all models failed to respond... 😅"
+    command = intents.match(user_input)
+    if command is not None:
+        yield await intents.handle(user_input, *command, history_graph, config)
+        return
 
-async def tts_consumer(queue):
-    """Consumes sentences from the queue and speaks them."""
-    while True:
-        sentence = await queue.get()
-        if sentence is None:
-            break
-        
-        # Final cleanup for TTS
-        clean_sentence = clean_text_for_tts(sentence)
-        if clean_sentence:
-            print(f"\n🎙️ Speaking: {clean_sentence}")
-            await speak_async(clean_sentence, voice='en-Davis_man')
-        
-        queue.task_done()
+    history = await load_history(history_graph, config)
+    turn = HumanMessage(content=user_input)
+    agents = [agent_groq, agent_ollama]
+    states = [{} for _ in agents]
+    won = []
+    lanes = [lambda agent=agent, state=state: _agent_stream(agent, history, turn, state)
+             for agent, state in zip(agents, states)]
+    answered = False
+    try:
+        async with contextlib.aclosing(hedged(lanes, names=["groq", "ollama"], on_winner=won.append)) as chunks:
+            async for chunk in chunks:
+                answered = True
+                yield chunk
+    except (asyncio.CancelledError, GeneratorExit):
+        # Barge-in: the lanes are cancelled by now, possibly in the middle of a tool call
+        state = states[won[0]] if won else {}
+        reply = f"{state.get('partial', '')} {INTERRUPTED_NOTE}".lstrip()
+        messages = close_turn(state.get("messages", [])[len(history):], turn, reply)
+        await commit_turn(history_graph, config, messages)
+        raise
+    messages = states[won[0]].get("messages", [])[len(history):] if won else []
+    if not answered:
+        messages = close_turn(messages, turn, FALLBACK_REPLY)
+    await commit_turn(history_graph, config, messages)
+    if not answered:
+        yield FALLBACK_REPLY
+
+async def tts_consumer(queue, ack=None):
+    """Consumes sentences from the queue and speaks them, synthesizing ahead of playback."""
+    async def sentences():
+        while True:
+            sentence = await queue.get()
+            if sentence is None:
+                break
+            yield sentence  # Already speakable (see SpeechSegmenter)
+            queue.task_done()
+
+    await SpeechScheduler(voice=VOICE, ack=ack).play(sentences())
 
 async def process_and_speak(user_input):
     """Streams from LLM, buffers sentences, and feeds them to TTS."""
+    # End of speech: if the answer is slow to start, an earcon / filler covers the gap
+    ack = Acknowledger(VOICE)
+    ack.arm()
     queue = asyncio.Queue()
-    consumer_task = asyncio.create_task(tts_consumer(queue))
-    
-    sentence_buffer = ""
+    consumer_task = asyncio.create_task(tts_consumer(queue, ack))
+    try:
+        async with memory.turn():  # Holds off history compaction while the turn writes to it
+            await _stream_to_queue(user_input, queue)
+        await consumer_task
+    except asyncio.CancelledError:
+        # Barge-in: stop the LLM stream and the in-flight TTS request together
+        ack.cancel()
+        consumer_task.cancel()
+        raise
+
+async def _stream_to_queue(user_input, queue):
+    """Streams the LLM answer and pushes speakable segments onto the TTS queue."""
+    # Short first segment (fast first audio), then longer ones (fewer TTS requests)
+    segmenter = SpeechSegmenter()
     print("\n🤖 Nova: ", end="", flush=True)
     
-    async for chunk in stream_with_fallback(user_input):
-        print(chunk, end="", flush=True)
-        sentence_buffer += chunk
-        
-        # Robust sentence splitting:
-        # 1. Look for . ! ? or \n
-        # 2. Ensure it's not preceded by a digit (avoid splitting 4.2)
-        # 3. Ensure it's followed by a space or end of stream
-        if any(p in chunk for p in ".!?\n"):
-            # Split only on punctuation NOT preceded by a digit, followed by whitespace
-            parts = re.split(r'(?<=[^0-9][.!?\n])\s+', sentence_buffer)
-            
-            if len(parts) > 1:
-                # Keep the last part in buffer as it might be incomplete
-                sentence_buffer = parts.pop()
-                for part in parts:
-                    if part.strip():
-                        await queue.put(part)
+    # Closed right away on barge-in, so the interrupted turn is saved before the next one starts
+    async with contextlib.aclosing(stream_with_fallback(user_input)) as chunks:
+        async for chunk in chunks:
+            print(chunk, end="", flush=True)
+            for segment in segmenter.feed(chunk):
+                await queue.put(segment)
     
     # Final flush
-    if sentence_buffer.strip():
-        await queue.put(sentence_buffer)
+    for segment in segmenter.flush():
+        await queue.put(segment)
     
     print() 
     await queue.put(None) 
-    await consumer_task
+
+async def speak_with_barge_in(user_input):
+    """
+    Speaks the answer while watching the mic for the user talking over it.
+    Returns the mic position to start the next turn from if they did, else None.
+    """
+    async def speak_fully():
+        await process_and_speak(user_input)
+        await wait_until_done()
+
+    stop = threading.Event()
+    speaking = asyncio.create_task(speak_fully())
+    watching = asyncio.create_task(barge_in.watch(stop))
+    try:
+        await asyncio.wait({speaking, watching}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stop.set()
+
+    start_at = await watching
+    if start_at is None or speaking.done():
+        await speaking
+        return None
+
+    print("\n✋ Barge-in, stopping playback...")
+    speaking.cancel()
+    flush()
+    try:
+        await speaking
+    except asyncio.CancelledError:
+        pass
+    return start_at
 
 async def main_loop():
     TIMEOUT_INITIAL = 5    
     TIMEOUT_FOLLOWUP = 6  
 
+    timeline = StartupTimeline()
+    await setup()
+    lights = WLEDClient()  # Status lights (active / sleep)
     start_stream() # Initialize hardware early
+    audio_capture.start_capture() # Shared mic stays open for wake word and VAD
+    # The wake word comes up first; everything else warms up in parallel while we listen
+    await timeline.run("wake word", asyncio.to_thread(wakeword.load))
+    warming = asyncio.create_task(warm_up(timeline, {
+        "whisper": asyncio.to_thread(stt_vad.load),
+        "groq": warm_groq(model),
+        "ollama": warm_ollama(ollama_model),
+        "tts": warm_tts([s for p in PREWARM_PHRASES for s in segment(p)], VOICE),
+    }))
+    compaction = None
 
     while True:
         try:
             print("\n💤 Waiting for Wake Word ('Hey Mycroft')...")
             if await asyncio.to_thread(wakeword.listen_for_wake_word):
                 print("⚡ Wake Word Detected! entering Active Mode...")
-                control_wled_impl(color="cyan")
+                lights.update(color="cyan")  # Fire-and-forget: never delays listening
                 
                 current_timeout = TIMEOUT_INITIAL
+                # First command is read from right after the wake word, even if already spoken
+                start_at = wakeword.detected_at
                 
                 while True:
-                    user_input = await asyncio.to_thread(take_command, timeout=current_timeout)
+                    if STREAMING_STT:
+                        user_input = await take_command_async(timeout=current_timeout, start_at=start_at)
+                    else:
+                        user_input = await asyncio.to_thread(take_command, timeout=current_timeout, start_at=start_at)
+                    start_at = None
                     
                     if user_input is None:
                         print(f"⏳ Timeout ({current_timeout}s) - Going to sleep.")
-                        control_wled_impl(preset=1)
+                        lights.update(preset=1)
                         break 
                     
-                    # Process and Speak
-                    await process_and_speak(user_input)
-                    
-                    # Wait for TTS to finish to avoid hearing self
-                    await wait_until_done()
+                    if BARGE_IN:
+                        # Mic stays live during playback; echo of Nova's own voice is suppressed
+                        start_at = await speak_with_barge_in(user_input)
+                    else:
+                        # Process and Speak
+                        await process_and_speak(user_input)
+                        
+                        # Wait for TTS to finish to avoid hearing self
+                        await wait_until_done()
+
+                    # Summarize old turns (if over budget) while the user thinks of a reply
+                    if compaction is None or compaction.done():
+                        compaction = asyncio.create_task(memory.compact(history_graph, config))
                     
                     print("✨ Listening for follow-up...")
                     current_timeout = TIMEOUT_FOLLOWUP
@@ -197,6 +317,17 @@ async def main_loop():
         except Exception as e:
             print(f"❌ Error in main loop: {e}")
 
+    warming.cancel()
+    if compaction is not None:
+        compaction.cancel()
+    await close_checkpointer(checkpointer)
+    print(f"🗃️ TTS cache: {cache.stats()}")
+    cache.close()  # Finishes queued disk writes
+    tool_pool.shutdown()
+    await lights.close()
+    wakeword.shutdown()
+    print(f"🎚️ Wake word gate: {wakeword.gate_stats()}")
+    audio_capture.stop_capture()
     stop_stream()
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+import asyncio
+import collections
+import numpy as np
+import audio_capture
+import tts
+from block_vad import BlockVAD, FRAME_SIZE
+
+# Constants
+RATE = audio_capture.RATE
+BLOCK_FRAMES = 4  # 120 ms per read while monitoring playback
+VAD_MODE = 3
+CONFIRM_FRAMES = 8  # Speech frames (out of the last CONFIRM_WINDOW) that confirm a barge-in
+CONFIRM_WINDOW = 12
+PRE_ROLL_S = 0.5  # The new turn starts this far before the confirmed speech
+
+# Echo suppression
+MAX_DELAY_S = 0.4  # Longest speaker -> mic delay searched for
+DELAY_SEARCH_S = 1.0  # Audio used to estimate the delay
+OVER_SUBTRACTION = 1.5  # How hard the echo estimate is subtracted
+SPECTRAL_FLOOR = 0.05  # Never take a bin below this fraction of the mic magnitude
+COUPLING_ALPHA = 0.05  # Adaptation speed of the speaker -> mic coupling per bin
+
+
+def estimate_delay(mic, ref, max_lag):
+    """Lag (in samples) of ref inside mic that maximises their cross-correlation."""
+    n = len(mic) + len(ref)
+    size = 1 << (n - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(mic, size) * np.conj(np.fft.rfft(ref, size)), size)
+    return int(np.argmax(corr[:max_lag + 1]))
+
+
+class EchoSuppressor:
+    """
+    Reference-based echo suppression on 30 ms frames.
+    The known TTS output (delay-aligned) is turned into a per-bin echo magnitude
+    estimate through a slowly adapting coupling gain, and subtracted from the mic
+    spectrum. The result is only used to decide whether the user is speaking, so
+    some musical-noise artefacts are fine.
+    """
+
+    def __init__(self, frame_size=FRAME_SIZE):
+        self.frame_size = frame_size
+        # Start pessimistic: assume the echo is as loud as the reference
+        self.coupling = np.ones(frame_size // 2 + 1, dtype=np.float32)
+
+    def process(self, mic, ref):
+        """mic and ref are (n_frames, frame_size) float32. Returns the cleaned frames."""
+        M = np.fft.rfft(mic, axis=1)
+        R = np.abs(np.fft.rfft(ref, axis=1))
+        mag = np.abs(M)
+
+        # Adapt coupling on frames where the mic is not much louder than the echo estimate
+        # (i.e. probably echo only, no double talk)
+        active = R.sum(axis=1) > 1e-3
+        if active.any():
+            ratio = mag[active] / (R[active] + 1e-6)
+            echo_only = ratio < 2 * self.coupling
+            update = np.where(echo_only, ratio, self.coupling).mean(axis=0)
+            self.coupling += COUPLING_ALPHA * (update - self.coupling)
+
+        echo = OVER_SUBTRACTION * self.coupling * R
+        cleaned = np.maximum(mag - echo, SPECTRAL_FLOOR * mag)
+        return np.fft.irfft(cleaned * np.exp(1j * np.angle(M)), self.frame_size, axis=1).astype(np.float32)
+
+
+class BargeInDetector:
+    """
+    Watches the shared microphone while Nova is speaking.
+    Mic frames are echo-suppressed against tts.reference and scored with the block VAD;
+    enough speech in a short window confirms that the user is talking over the answer.
+    """
+
+    def __init__(self):
+        self.vad = BlockVAD(VAD_MODE, RATE, FRAME_SIZE)
+        self.suppressor = EchoSuppressor()
+
+    def listen(self, stop_event):
+        """
+        Blocks until the user speaks over playback or stop_event is set.
+        Returns the mic ring position the new turn should start from, or None.
+        """
+        block = FRAME_SIZE * BLOCK_FRAMES
+        reader = audio_capture.get_reader()
+        # Mic position minus reference position at the same wall-clock instant
+        offset = audio_capture.ring.write_pos - tts.reference.write_pos
+        delay = int((audio_capture.input_latency() + tts.output_latency()) * RATE)
+        delay_refined = False
+        recent = collections.deque(maxlen=CONFIRM_WINDOW)
+
+        while not stop_event.is_set():
+            mic = reader.read(block, timeout=0.2)
+            if mic is None:
+                continue
+            mic_start = reader.pos - block
+            mic_f = mic.astype(np.float32) / 32768.0
+
+            # Replace the latency-based guess with a measured delay once something has played
+            if not delay_refined:
+                measured = self._measure_delay(reader.pos, offset)
+                if measured is not None:
+                    delay, delay_refined = measured, True
+
+            ref = self._reference(mic_start - offset - delay, block)
+            cleaned = self.suppressor.process(mic_f.reshape(-1, FRAME_SIZE), ref.reshape(-1, FRAME_SIZE))
+            cleaned = np.clip(cleaned.ravel() * 32768.0, -32768, 32767).astype(np.int16)
+
+            for i, active in enumerate(self.vad.is_speech(cleaned)):
+                recent.append(bool(active))
+                if sum(recent) >= CONFIRM_FRAMES:
+                    speech_pos = mic_start + (i + 1) * FRAME_SIZE - CONFIRM_WINDOW * FRAME_SIZE
+                    return max(speech_pos - int(PRE_ROLL_S * RATE), audio_capture.ring.oldest_pos)
+        return None
+
+    def _reference(self, start, n):
+        """Reference samples for [start, start + n), zeros where the ring has none."""
+        ring = tts.reference
+        if start < ring.oldest_pos or start + n > ring.write_pos:
+            return np.zeros(n, dtype=np.float32)
+        return ring.read(start, n)
+
+    def _measure_delay(self, mic_end, offset):
+        """
+        Cross-correlates the last second of mic audio with the reference to find the
+        speaker -> mic delay in samples. Returns None while nothing has been played.
+        """
+        n = int(DELAY_SEARCH_S * RATE)
+        max_lag = int(MAX_DELAY_S * RATE)
+        mic_start = mic_end - n - max_lag
+        if mic_start < audio_capture.ring.oldest_pos:
+            return None
+        ref = self._reference(mic_start - offset, n)
+        if np.sqrt(np.mean(ref * ref)) < 1e-3:
+            return None
+        mic = audio_capture.ring.read(mic_start, n + max_lag).astype(np.float32) / 32768.0
+        return estimate_delay(mic, ref, max_lag)
+
+
+# One detector for the session, so the learned speaker -> mic coupling carries over between answers
+detector = BargeInDetector()
+
+async def watch(stop_event):
+    """Runs the detector in a worker thread. Returns the new turn's start position or None."""
+    return await asyncio.to_thread(detector.listen, stop_event)
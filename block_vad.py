@@ -0,0 +1,115 @@
+import time
+import numpy as np
+import webrtcvad
+
+# Constants
+RATE = 16000
+FRAME_DURATION_MS = 30
+FRAME_SIZE = int(RATE * FRAME_DURATION_MS / 1000)  # 480 samples
+BLOCK_FRAMES = 5  # Frames scored per call (150 ms)
+
+# Pre-gate: frames this quiet never reach webrtcvad
+ENERGY_FLOOR = 100.0  # RMS in int16 units (~ -50 dBFS)
+ZCR_NOISE = 0.35  # Zero-crossing rate of hiss; only rejected when also fairly quiet
+ZCR_LOUD_FACTOR = 4.0  # Above ENERGY_FLOOR * this, ZCR never rejects (fricatives)
+
+
+class BlockVAD:
+    """
+    Scores a whole block of 30 ms frames at once.
+    A vectorized RMS / zero-crossing pre-gate drops silent and hissy frames, and
+    only the frames that pass are handed to webrtcvad, sliced out of one bytes
+    buffer for the whole block instead of one tobytes() per frame.
+    """
+
+    def __init__(self, mode, rate=RATE, frame_size=FRAME_SIZE, energy_floor=ENERGY_FLOOR):
+        self.vad = webrtcvad.Vad(mode)
+        self.rate = rate
+        self.frame_size = frame_size
+        self.energy_floor = energy_floor
+        self.frames_seen = 0
+        self.frames_gated = 0
+
+    def gate(self, frames):
+        """Boolean mask of frames worth running the real VAD on. frames is (n, frame_size) int16."""
+        x = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(x * x, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (self.frame_size - 1)
+        loud = rms >= self.energy_floor * ZCR_LOUD_FACTOR
+        return (rms >= self.energy_floor) & ((zcr < ZCR_NOISE) | loud)
+
+    def is_speech(self, block):
+        """
+        Returns a boolean array with one speech decision per frame of block.
+        block is int16; a trailing partial frame (webrtcvad only takes whole
+        10/20/30 ms frames) gets its own decision, always not-speech.
+        Errors from webrtcvad propagate.
+        """
+        whole = len(block) // self.frame_size
+        frames = block[:whole * self.frame_size].reshape(whole, self.frame_size)
+        candidates = self.gate(frames)
+        decisions = np.zeros(whole + (len(block) > whole * self.frame_size), dtype=bool)
+
+        self.frames_seen += len(frames)
+        self.frames_gated += len(frames) - int(np.count_nonzero(candidates))
+
+        if candidates.any():
+            data = block.tobytes()
+            step = self.frame_size * 2
+            for i in np.flatnonzero(candidates):
+                decisions[i] = self.vad.is_speech(data[i * step:(i + 1) * step], self.rate)
+        return decisions
+
+    def gated_ratio(self):
+        """Fraction of frames the pre-gate answered without webrtcvad."""
+        return self.frames_gated / self.frames_seen if self.frames_seen else 0.0
+
+
+def _synthetic_audio(seconds, rate=RATE, speech_ratio=0.2):
+    """Quiet room noise with voiced, speech-like bursts (harmonics + envelope)."""
+    rng = np.random.default_rng(0)
+    n = seconds * rate
+    audio = rng.normal(0, 30, n)
+    t = np.arange(rate) / rate
+    burst = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((140, 280, 420, 700, 1100), 1))
+    burst *= 3000 * np.abs(np.sin(2 * np.pi * 3 * t))
+    for start in range(0, n - rate, rate):
+        if rng.random() < speech_ratio:
+            audio[start:start + rate] += burst
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def benchmark(seconds=60, mode=3):
+    """Frames per second: per-frame webrtcvad (old stt_vad loop) vs BlockVAD."""
+    audio = _synthetic_audio(seconds)
+    n_frames = len(audio) // FRAME_SIZE
+    audio = audio[:n_frames * FRAME_SIZE]
+
+    # Before: one tobytes() + is_speech + try/except per 30 ms frame
+    vad = webrtcvad.Vad(mode)
+    start = time.perf_counter()
+    for i in range(n_frames):
+        frame = audio[i * FRAME_SIZE:(i + 1) * FRAME_SIZE]
+        try:
+            vad.is_speech(frame.tobytes(), RATE)
+        except Exception:
+            pass
+    before = n_frames / (time.perf_counter() - start)
+
+    # After: BLOCK_FRAMES at a time through the pre-gate
+    block_vad = BlockVAD(mode)
+    block = FRAME_SIZE * BLOCK_FRAMES
+    start = time.perf_counter()
+    for i in range(0, len(audio) - block + 1, block):
+        block_vad.is_speech(audio[i:i + block])
+    after = block_vad.frames_seen / (time.perf_counter() - start)
+
+    print(f"Per-frame VAD : {before:,.0f} frames/s")
+    print(f"Block VAD     : {after:,.0f} frames/s ({after / before:.1f}x, "
+          f"{block_vad.gated_ratio():.0%} of frames answered by the pre-gate)")
+    return before, after
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,131 @@
+import re
+import collections
+import numpy as np
+
+# Constants
+DEFAULT_SILENCE_S = 1.0  # Used until we have learned enough about the speaker
+COMPLETE_SILENCE_S = 0.3  # Transcript looks finished: cut short
+INCOMPLETE_SILENCE_S = 1.6  # Trailing "and"/"um"/comma: give them time
+MIN_LEARNED_SILENCE_S = 0.5  # Learned stats alone never cut tighter than this
+MAX_SILENCE_S = 2.0
+
+# Learned pause statistics
+MIN_PAUSES_TO_LEARN = 10  # Within-utterance pauses needed before trusting the stats
+PAUSE_HISTORY = 200
+PAUSE_PERCENTILE = 95
+PAUSE_MARGIN_S = 0.15
+MIN_PAUSE_S = 0.1  # Shorter gaps are VAD flicker between words, not pauses
+
+# Words that mean the sentence is not over yet
+INCOMPLETE_ENDINGS = {
+    "and", "or", "but", "so", "because", "then", "if", "than", "that", "which",
+    "the", "a", "an", "to", "of", "with", "for", "in", "on", "at", "from", "about",
+    "my", "your", "his", "her", "their", "our", "this", "is", "are", "was",
+    "please", "set", "turn", "play", "open", "search", "what's", "whats",
+}
+HESITATIONS = {"um", "uh", "uhm", "umm", "er", "erm", "hmm"}
+
+# Short commands that are complete even without punctuation
+COMPLETE_PATTERNS = [
+    re.compile(p) for p in (
+        r"^(what|what's|whats) (is )?the (time|date|day)( now| today)?$",
+        r"^what (time|day) is it( now| today)?$",
+        r"^(turn )?(the )?lights? (on|off)$",
+        r"^(turn )?(the )?lights? (to )?\w+$",
+        r"^(stop|cancel|pause|resume|never ?mind|thanks|thank you)$",
+        r"^(what's |what is )?(the )?battery( level| status)?$",
+    )
+]
+
+_word_re = re.compile(r"[a-z']+")
+
+
+def classify_transcript(text):
+    """
+    Returns 'complete', 'incomplete' or 'unknown' for a (partial) transcript.
+    """
+    if not text:
+        return "unknown"
+    stripped = text.strip()
+    words = _word_re.findall(stripped.lower())
+    if not words:
+        return "unknown"
+
+    last = words[-1]
+    if last in HESITATIONS or last in INCOMPLETE_ENDINGS:
+        return "incomplete"
+    if stripped.endswith((",", "...", "…", "-", ":")):
+        return "incomplete"
+
+    plain = " ".join(words)
+    if any(p.match(plain) for p in COMPLETE_PATTERNS):
+        return "complete"
+    if stripped.endswith(("?", "!", ".")) and len(words) >= 2:
+        return "complete"
+    return "unknown"
+
+
+class Endpointer:
+    """
+    Decides when a turn is over, frame by frame.
+    The silence threshold adapts to the speaker (learned from the pauses they make
+    mid-utterance over the session) and to the partial transcript: it is cut short
+    when the words so far look like a finished command and stretched when they end
+    on a conjunction or a hesitation.
+    """
+
+    def __init__(self, default_silence_s=DEFAULT_SILENCE_S):
+        self.default_silence_s = default_silence_s
+        self.pauses = collections.deque(maxlen=PAUSE_HISTORY)
+        self.reset()
+
+    def reset(self, start_s=0.0):
+        """
+        Starts a new utterance (learned pause stats are kept).
+        start_s is how much audio (e.g. pre-roll) the utterance already holds.
+        """
+        self.elapsed_s = start_s
+        self.silence_s = 0.0
+        self.speech_end_s = start_s
+        self.transcript = ""
+        self.transcript_until_s = 0.0
+
+    def set_transcript(self, text, covers_until_s):
+        """Latest partial hypothesis and how much of the utterance audio it was decoded from."""
+        self.transcript = text
+        self.transcript_until_s = covers_until_s
+
+    def learned_silence_s(self):
+        """Silence threshold from this speaker's own pause lengths."""
+        if len(self.pauses) < MIN_PAUSES_TO_LEARN:
+            return self.default_silence_s
+        limit = np.percentile(self.pauses, PAUSE_PERCENTILE) + PAUSE_MARGIN_S
+        return float(np.clip(limit, MIN_LEARNED_SILENCE_S, MAX_SILENCE_S))
+
+    def silence_limit_s(self):
+        """Current end-of-turn silence threshold in seconds."""
+        base = self.learned_silence_s()
+
+        # Only trust a transcript that was decoded from all of the speech so far
+        if self.transcript_until_s < self.speech_end_s:
+            return base
+
+        kind = classify_transcript(self.transcript)
+        if kind == "complete":
+            return min(base, COMPLETE_SILENCE_S)
+        if kind == "incomplete":
+            return max(base, INCOMPLETE_SILENCE_S)
+        return base
+
+    def update(self, active, frame_s):
+        """Feeds one VAD decision. Returns True when the turn should end."""
+        self.elapsed_s += frame_s
+        if active:
+            if self.silence_s >= MIN_PAUSE_S:
+                self.pauses.append(self.silence_s)
+            self.silence_s = 0.0
+            self.speech_end_s = self.elapsed_s
+            return False
+
+        self.silence_s += frame_s
+        return self.silence_s > self.silence_limit_s()
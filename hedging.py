@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import contextvars
+from langchain_core.tools import StructuredTool
+
+# Configuration
+HEDGE_BUDGET_S = 1.5  # Start the next model if the current one has produced nothing by then (None = only on error)
+HEDGE_IMMEDIATE = False  # Start every model at once instead
+
+# (race, lane) of the model running in the current task; tools read it to know who is calling
+_lane = contextvars.ContextVar("hedge_lane", default=None)
+
+
+class Race:
+    """
+    Who won the current hedged request. The first lane to produce output or to reach
+    a side-effecting tool wins; every other lane is refused tools and then cancelled.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.events = asyncio.Queue()
+        self.winner = None
+        self._lock = threading.Lock()
+
+    def settle(self, lane):
+        """Declares lane the winner unless another lane already won. Returns the winner."""
+        with self._lock:
+            if self.winner is None:
+                self.winner = lane
+            return self.winner
+
+    def claim_tools(self, lane):
+        """Called from tool threads: True if lane may run side-effecting tools."""
+        with self._lock:
+            first = self.winner is None
+            if first:
+                self.winner = lane
+            allowed = self.winner == lane
+        if first:
+            self.loop.call_soon_threadsafe(self.events.put_nowait, ("claim", lane, None))
+        return allowed
+
+
+def guard_tools(tools, side_effect_names):
+    """
+    Wraps the side-effecting tools so that, inside a hedged request, only the winning
+    model can run them. Outside a race they behave exactly like the originals.
+    """
+    guarded = []
+    for tool in tools:
+        if tool.name not in side_effect_names:
+            guarded.append(tool)
+            continue
+
+        def run(_tool=tool, **kwargs):
+            current = _lane.get()
+            if current is not None and not current[0].claim_tools(current[1]):
+                return "Skipped: another model is already handling this request."
+            return _tool.invoke(kwargs)
+
+        guarded.append(StructuredTool.from_function(
+            func=run, name=tool.name, description=tool.description, args_schema=tool.args_schema,
+        ))
+    return guarded
+
+
+async def _pump(race, lane, make_stream):
+    _lane.set((race, lane))
+    try:
+        async for item in make_stream():
+            race.events.put_nowait(("item", lane, item))
+        race.events.put_nowait(("end", lane, None))
+    except Exception as e:
+        race.events.put_nowait(("error", lane, e))
+
+
+async def hedged(lanes, budget_s=HEDGE_BUDGET_S, immediate=HEDGE_IMMEDIATE, names=None, on_winner=None):
+    """
+    Streams from whichever of lanes (functions returning async iterators, in order of
+    preference) produces first. The next lane is started when the running ones have
+    produced nothing for budget_s, or at once if one fails; the losers are cancelled
+    as soon as there is a winner, and on_winner (if given) is called with its index.
+    Yields nothing if every lane failed.
+    """
+    names = names or [str(i) for i in range(len(lanes))]
+    loop = asyncio.get_running_loop()
+    race = Race(loop)
+    tasks = {}
+    next_lane = 0
+    winner = None
+    produced = False
+    claimed = False
+
+    def start_next():
+        nonlocal next_lane
+        tasks[next_lane] = asyncio.create_task(_pump(race, next_lane, lanes[next_lane]))
+        next_lane += 1
+
+    def running():
+        return [lane for lane, task in tasks.items() if not task.done()]
+
+    start_next()
+    while immediate and next_lane < len(lanes):
+        start_next()
+    deadline = None if budget_s is None else loop.time() + budget_s
+
+    try:
+        while True:
+            timeout = None
+            if winner is None and next_lane < len(lanes) and deadline is not None:
+                timeout = max(0.0, deadline - loop.time())
+            try:
+                kind, lane, payload = await asyncio.wait_for(race.events.get(), timeout)
+            except asyncio.TimeoutError:
+                print(f"\n⏱️ {names[next_lane - 1]} has said nothing for {budget_s}s, also asking {names[next_lane]}")
+                start_next()
+                deadline = loop.time() + budget_s
+                continue
+
+            if winner is not None and lane != winner:
+                continue  # Late event from a cancelled loser
+
+            if kind in ("item", "claim"):
+                if winner is None:
+                    winner = race.settle(lane)
+                    if on_winner is not None:
+                        on_winner(winner)
+                    for other, task in tasks.items():
+                        if other != winner:
+                            task.cancel()
+                if lane != winner:
+                    continue
+                if kind == "claim":
+                    claimed = True
+                else:
+                    produced = True
+                    yield payload
+                continue
+
+            # "end" or "error"
+            if kind == "error":
+                print(f"Agent {names[lane]} failed: {payload}")
+            if produced or claimed:
+                return  # Never replay an answer (or its tool calls) on another model
+            winner = None
+            if next_lane < len(lanes):
+                start_next()
+                deadline = None if budget_s is None else loop.time() + budget_s
+            elif not running():
+                return
+    finally:
+        for task in tasks.values():
+            task.cancel()
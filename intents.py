@@ -0,0 +1,113 @@
+import re
+import time
+import uuid
+import asyncio
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+from tools import COLORS, control_wled_impl, get_current_date_time, battery_info_impl
+
+# Fast path for the most frequent device commands: a strict grammar in front of the agent.
+# Only whole-utterance matches are handled here; anything else goes to the LLM as before.
+
+_FILLER = re.compile(
+    r"^(?:(?:hey |ok |okay )?(?:nova|mycroft)\s+)?(?:(?:can|could|would|will) you\s+)?(?:please\s+)?"
+    r"|\s+(?:please|now|for me)$"
+)
+_PUNCT = re.compile(r"[^\w%#\s]")
+_SPACES = re.compile(r"\s+")
+
+_LIGHTS = r"(?:the\s+)?(?:lights?|leds?|wled|lamp)"
+_COLOR = "(?P<color>" + "|".join(sorted((re.escape(c) for c in COLORS), key=len, reverse=True)) + ")"
+
+GRAMMAR = [
+    ("lights_power", re.compile(rf"^(?:turn|switch|put)\s+{_LIGHTS}\s+(?P<power>on|off)$")),
+    ("lights_power", re.compile(rf"^(?:turn|switch)\s+(?P<power>on|off)\s+{_LIGHTS}$")),
+    ("lights_power", re.compile(rf"^{_LIGHTS}\s+(?P<power>on|off)$")),
+    ("lights_color", re.compile(rf"^(?:(?:set|make|change|turn|switch)\s+)?{_LIGHTS}\s+(?:to\s+)?{_COLOR}$")),
+    ("lights_brightness", re.compile(
+        rf"^(?:set\s+)?{_LIGHTS}(?:\s+brightness)?\s+(?:to\s+)?(?P<percent>\d{{1,3}})\s*(?:%|percent)$")),
+    ("time", re.compile(r"^(?:what(?:s| is) the time|what time is it)(?: now)?$")),
+    ("date", re.compile(r"^(?:what(?:s| is) (?:the date(?: today)?|todays date|today)|what day is (?:it|today))$")),
+    ("battery", re.compile(r"^(?:(?:whats|what is) (?:the |my )?)?battery(?: level| status| percentage)?$")),
+    ("battery", re.compile(r"^how much battery(?: do i have| is left)?$")),
+]
+
+
+def normalize(text):
+    text = _PUNCT.sub("", text.lower())
+    text = _SPACES.sub(" ", text).strip()
+    return _FILLER.sub("", text).strip()
+
+
+def match(text):
+    """Returns (intent, slots) if the whole utterance is a known command, else None."""
+    normalized = normalize(text)
+    for intent, pattern in GRAMMAR:
+        m = pattern.match(normalized)
+        if m:
+            return intent, {k: v for k, v in m.groupdict().items() if v is not None}
+    return None
+
+
+def _lights_reply(result, done):
+    if result.startswith("Success"):
+        return done
+    return "Hmm, I couldn't reach the lights."
+
+
+def _run(intent, slots):
+    """Calls the tool for an intent. Returns (tool name, tool args, tool result, spoken reply)."""
+    if intent == "lights_power":
+        args = {"power": slots["power"] == "on"}
+        result = control_wled_impl(**args)
+        return "control_wled", args, result, _lights_reply(result, f"Lights {slots['power']}.")
+    if intent == "lights_color":
+        args = {"color": slots["color"]}
+        result = control_wled_impl(**args)
+        return "control_wled", args, result, _lights_reply(result, f"Done, the lights are {slots['color']}.")
+    if intent == "lights_brightness":
+        percent = max(0, min(100, int(slots["percent"])))
+        args = {"brightness": round(percent * 255 / 100)}
+        result = control_wled_impl(**args)
+        return "control_wled", args, result, _lights_reply(result, f"Brightness set to {percent} percent.")
+    if intent in ("time", "date"):
+        result = get_current_date_time.invoke({})
+        fields = dict(part.split(": ", 1) for part in result.split(", "))
+        if intent == "time":
+            reply = f"It's {fields['time'].lstrip('0')}."
+        else:
+            day = time.strptime(fields["date"], "%Y-%m-%d")
+            reply = f"It's {fields['day']}, {time.strftime('%B', day)} {day.tm_mday}."
+        return "get_current_date_time", {}, result, reply
+    if intent == "battery":
+        args = {"target": "battery"}
+        result = battery_info_impl()  # What get_system_info(target="battery") returns, without its Wi-Fi probe
+        m = re.search(r"(\d+(?:\.\d+)?)% \((not )?charging", result)  # psutil may report e.g. 85.26
+        if m:
+            reply = f"Battery's at {round(float(m.group(1)))} percent{' and charging' if not m.group(2) else ''}."
+        else:
+            reply = "I can't read the battery on this machine."
+        return "get_system_info", args, result, reply
+    raise ValueError(f"Unknown intent {intent}")
+
+
+async def handle(user_input, intent, slots, graph, config):
+    """
+    Runs a matched command directly and records the turn (user message, tool call,
+    tool result, reply) in the graph's checkpointer, as if the agent had done it.
+    Returns the reply text.
+    """
+    start = time.perf_counter()
+    tool_name, args, result, reply = await asyncio.to_thread(_run, intent, slots)
+    call_id = f"fast_{uuid.uuid4().hex[:12]}"
+    await graph.aupdate_state(
+        config,
+        {"messages": [
+            HumanMessage(content=user_input),
+            AIMessage(content="", tool_calls=[{"name": tool_name, "args": args, "id": call_id}]),
+            ToolMessage(content=result, tool_call_id=call_id),
+            AIMessage(content=reply),
+        ]},
+        as_node="agent",
+    )
+    print(f"\n⚡ Fast path: {intent} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+    return reply
@@ -0,0 +1,83 @@
+import time
+
+# Configuration
+REALTIME_RATE = 24000  # Samples per second the speaker consumes
+DEFAULT_CHARS_PER_S = 15.0  # Assumed speaking rate, to guess a sentence's length from its text
+MIN_MEASURE_S = 0.15  # Arrivals spanning less than this don't give a usable rate
+SAFETY = 1.2  # Extra cushion on top of the computed minimum
+EWMA_ALPHA = 0.3  # How fast the per-session estimates follow new utterances
+
+
+class JitterBuffer:
+    """
+    Decides how long to hold back a sentence before it starts playing.
+    The server's production rate r (samples received per wall-clock second) is
+    measured per utterance. Playing at the real-time rate R never underruns as long
+    as the audio already queued covers remaining * (R / r - 1) samples, where
+    remaining is what the server still has to send. A server faster than real time
+    therefore plays immediately; a slow one gets just enough cushion.
+    """
+
+    def __init__(self, rate=REALTIME_RATE):
+        self.rate = rate
+        self.rate_x = None  # Production speed, x real time (session estimate; None until measured)
+        self.chars_per_s = DEFAULT_CHARS_PER_S
+        self.last_rate_x = None
+        self.last_delay_s = 0.0
+        self.delays = 0
+        self.total_delay_s = 0.0
+
+    def utterance_rate_x(self, received, first_at, first_len, now=None):
+        """
+        Production speed of an utterance in progress, or the session estimate if too early
+        to tell (None if nothing has been measured yet this session).
+        """
+        if first_at is None or received <= first_len:
+            return self.rate_x
+        elapsed = (time.monotonic() if now is None else now) - first_at
+        if elapsed < MIN_MEASURE_S:
+            return self.rate_x
+        return (received - first_len) / elapsed / self.rate
+
+    def ready(self, text, received, first_at, first_len, queued, done):
+        """
+        True once playback of the utterance may start (or continue feeding the ring):
+        queued is what would be in front of the speaker (ring fill + held samples).
+        """
+        if done:
+            return True
+        rate_x = self.utterance_rate_x(received, first_at, first_len)
+        if rate_x is None:
+            return False  # First utterance of the session: wait until its rate is measurable
+        if rate_x >= 1.0:
+            return True
+        expected = len(text) / self.chars_per_s * self.rate
+        remaining = max(expected - received, 0)
+        return queued >= remaining * (1.0 / max(rate_x, 0.05) - 1.0) * SAFETY
+
+    def record_delay(self, delay_s):
+        self.last_delay_s = delay_s
+        self.delays += 1
+        self.total_delay_s += delay_s
+
+    def finished(self, text, received, first_at, first_len, end_at, reliable=True):
+        """Updates the session estimates from a completely received utterance."""
+        if received <= 0:
+            return
+        duration_s = received / self.rate
+        self.chars_per_s += EWMA_ALPHA * (len(text) / duration_s - self.chars_per_s)
+        if reliable and first_at is not None and end_at - first_at >= MIN_MEASURE_S and received > first_len:
+            self.last_rate_x = (received - first_len) / (end_at - first_at) / self.rate
+            if self.rate_x is None:
+                self.rate_x = self.last_rate_x
+            else:
+                self.rate_x += EWMA_ALPHA * (self.last_rate_x - self.rate_x)
+
+    def stats(self, underruns=0):
+        return {
+            "rate_x_realtime": self.last_rate_x,
+            "session_rate_x": self.rate_x,
+            "last_delay_s": self.last_delay_s,
+            "mean_delay_s": self.total_delay_s / max(self.delays, 1),
+            "underruns": underruns,
+        }
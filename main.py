@@ -3,26 +3,46 @@ from dotenv import load_dotenv
 from langgraph.prebuilt import create_react_agent
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
+from langchain_core.messages import HumanMessage
 import re
+import asyncio
+import threading
 from tts import speak
+import stt_vad
 from stt_vad import take_command
 import wakeword
-from langgraph.checkpoint.memory import InMemorySaver
+from memory import ConversationMemory, open_checkpointer, close_checkpointer, load_history, commit_turn, close_turn, THREAD_ID
 
 # Import all tools
-from tools import ALL_TOOLS, control_wled_impl, control_wled
+from tools import ALL_TOOLS, SIDE_EFFECT_TOOLS, control_wled_impl, control_wled
+from hedging import hedged, guard_tools
+import tool_pool
+from tool_pool import concurrent_tools
+import intents
 
 load_dotenv()
 
 model = ChatGroq(model='openai/gpt-oss-20b')
 ollama_model = ChatOllama(model='qwen3:4b')
-checkpointer = InMemorySaver()
+# One event loop for the whole session, running in its own thread: the SQLite checkpointer's
+# connection is bound to it, and history compaction runs on it while this script listens
+loop = asyncio.new_event_loop()
+loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+loop_thread.start()
 
+def run(coro):
+    """Runs coro on the session loop and waits for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
 
-agent_groq = create_react_agent(
-    model=model,
-    tools=ALL_TOOLS,
-    prompt = """
+checkpointer = run(open_checkpointer())  # SQLite (WAL): history survives restarts
+memory = ConversationMemory([model, ollama_model])  # Keeps the thread within its token budget
+
+# Groq and Ollama may run at the same time (hedging): only the winner gets to run side-effecting tools.
+# Several tool calls in one model step run side by side, each with a timeout.
+TOOLS = concurrent_tools(guard_tools(ALL_TOOLS, SIDE_EFFECT_TOOLS))
+
+
+PROMPT_GROQ = """
 You are Nova, a calm, witty, and exceptionally human-like voice assistant. 
 Your voice is being powered by a high-quality local TTS system that handles pauses and breathing very well.
 
@@ -35,14 +55,16 @@ Speaking Guidelines:
 - **Action-Oriented**: Perform the action first, then confirm. If an action takes time, say something like "On it..." immediately.
 
 Your goal is to be a helpful companion who is easy to talk to and sounds like a real person over the phone or in the room.
-""",
-    checkpointer=checkpointer
+"""
+
+agent_groq = create_react_agent(
+    model=model,
+    tools=TOOLS,
+    prompt=PROMPT_GROQ,
+    pre_model_hook=memory.hook(PROMPT_GROQ)
 )
 
-agent_ollama = create_react_agent(
-    model=ollama_model,
-    tools=ALL_TOOLS,
-    prompt = """
+PROMPT_OLLAMA = """
 You are a friendly, voice-first AI assistant. You sound calm, witty, and approachable—never robotic.
 
 Voice Response Rules:
@@ -52,36 +74,78 @@ Voice Response Rules:
 4. **Think Aloud**: Use words like "Hmm," "Let's see," or "Wait, let me check..." to sound like a co-pilot.
 5. **Vibe Check**: Match the user's energy and be empathetic when needed.
 6. **Efficiency**: Execute commands immediately and give a concise, warm update.
-""",
-    checkpointer=checkpointer
+"""
+
+agent_ollama = create_react_agent(
+    model=ollama_model,
+    tools=TOOLS,
+    prompt=PROMPT_OLLAMA,
+    pre_model_hook=memory.hook(PROMPT_OLLAMA)
 )
 
-config = {"configurable": {"thread_id": "2"}}
+# The agents are stateless (a lane that loses the race leaves no trace); this graph owns
+# the thread in the checkpointer: its state is read and written, it's never run
+history_graph = create_react_agent(model=model, tools=TOOLS, checkpointer=checkpointer)
+
+config = {"configurable": {"thread_id": THREAD_ID}}
+FALLBACK_REPLY = "Sorry, all models failed to respond. 😅"
+
+# Hedge budget for whole replies (this script doesn't stream, so it can't go by first token)
+HEDGE_BUDGET_S = 4.0
+
+async def _agent_reply(agent, history, turn, state):
+    """
+    One agent's full reply to history + turn, without <think> blocks (as a one-item
+    stream for hedging). Its final messages are left in state["messages"].
+    """
+    response = await agent.ainvoke({"messages": [*history, turn]})
+    state["messages"] = response['messages']
+    # Extract text and remove <think> blocks
+    text = response['messages'][-1].content
+    text_clean = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    if text_clean:
+        yield text_clean
 
 def invoke_with_fallback(user_input: str):
     """
-    Try Groq first, fall back to Ollama if an exception occurs.
+    Asks Groq, hedged with Ollama: Ollama is also asked if Groq fails or hasn't
+    answered within HEDGE_BUDGET_S, and the first answer wins (the other is cancelled).
     Strips <think> tags from the response automatically.
+    Only the winner's messages are added to the conversation.
     """
-    for agent in [agent_groq, agent_ollama]:
-        try:
-            response = agent.invoke(
-                {"messages": [{"role": "user", "content": user_input}]},
-                config
-            )
-            # Extract text and remove <think> blocks
-            text = response['messages'][-1].content
-            text_clean = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
-            return text_clean
-        except Exception as e:
-            print(f"Agent {agent.model} failed: {e}")
-            continue
-    return "Sorry, all models failed to respond. 😅"
+    async def race():
+        async with memory.turn():
+            # Known device commands ("lights red", "what time is it") skip the LLM entirely
+            command = intents.match(user_input)
+            if command is not None:
+                return await intents.handle(user_input, *command, history_graph, config)
+            history = await load_history(history_graph, config)
+            turn = HumanMessage(content=user_input)
+            agents = [agent_groq, agent_ollama]
+            states = [{} for _ in agents]
+            won = []
+            lanes = [lambda agent=agent, state=state: _agent_reply(agent, history, turn, state)
+                     for agent, state in zip(agents, states)]
+            text = "".join([text async for text in hedged(lanes, HEDGE_BUDGET_S, names=["groq", "ollama"],
+                                                          on_winner=won.append)])
+            messages = states[won[0]].get("messages", [])[len(history):] if won else []
+            if not text:
+                text = FALLBACK_REPLY
+                messages = close_turn(messages, turn, FALLBACK_REPLY)
+            await commit_turn(history_graph, config, messages)
+            return text
+
+    return run(race())
 
 # State Machine Constants
 TIMEOUT_INITIAL = 5    # Seconds to wait for first command after wake word
 TIMEOUT_FOLLOWUP = 6  # Seconds to wait for follow-up command after response
 
+# Wake word first; Whisper loads in the background while we wait for it
+wakeword.load()
+threading.Thread(target=stt_vad.load, daemon=True).start()
+compaction = None
+
 while True:
     try:
         # STATE 1: IDLE (Wait for Wake Word)
@@ -93,10 +157,13 @@ while True:
             control_wled_impl(color="cyan")
             
             current_timeout = TIMEOUT_INITIAL
+            # Pick up the command from right after the wake word (shared mic ring)
+            start_at = wakeword.detected_at
             
             while True:
                 # Listen
-                user_input = take_command(timeout=current_timeout)
+                user_input = take_command(timeout=current_timeout, start_at=start_at)
+                start_at = None
                 
                 if user_input is None:
                     # Timeout occurred (silence)
@@ -111,6 +178,10 @@ while True:
                 
                 # Speak Response
                 speak(response, voice='en-Davis_man')
+
+                # Summarize old turns (if over budget) in the background while the user thinks of a reply
+                if compaction is None or compaction.done():
+                    compaction = asyncio.run_coroutine_threadsafe(memory.compact(history_graph, config), loop)
                 
                 # Logic: After a successful interaction, we stay active for longer (Follow-up mode)
                 print("✨ Listening for follow-up...")
@@ -120,3 +191,13 @@ while True:
         break
     except Exception as e:
         print(f"❌ Error in main loop: {e}")
+
+if compaction is not None:
+    compaction.cancel()
+run(close_checkpointer(checkpointer))
+tool_pool.shutdown()
+wakeword.shutdown()
+print(f"🎚️ Wake word gate: {wakeword.gate_stats()}")
+loop.call_soon_threadsafe(loop.stop)
+loop_thread.join()
+loop.close()
@@ -0,0 +1,246 @@
+import os
+import json
+import asyncio
+import contextlib
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+# Configuration
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nova_memory.sqlite")
+THREAD_ID = "2"
+TOKEN_BUDGET = 3000  # History (excluding the system prompt) above this gets summarized
+KEEP_RECENT_TOKENS = 1200  # Newest turns kept word for word when summarizing
+STALE_TOOL_CHARS = 300  # Tool results from earlier turns are cut to this for the model
+INTERRUPTED_NOTE = "[interrupted by the user]"  # Ends an answer the user talked over
+CANCELLED_TOOL_RESULT = "Cancelled: the turn ended before this tool returned."
+SUMMARY_ID = "conversation_summary"
+SUMMARY_PREFIX = "Summary of the conversation so far:\n"
+SUMMARY_PROMPT = (
+    "You maintain the running memory of a voice assistant. Merge the previous summary and the "
+    "new conversation excerpt into one short summary (at most 150 words). Keep facts about the "
+    "user, their preferences, open requests and device states; drop small talk and raw tool output."
+)
+
+
+async def open_checkpointer(path=DB_PATH):
+    """
+    SQLite checkpointer (WAL mode) so history survives restarts. Must be awaited in the
+    loop that will use it: AsyncSqliteSaver binds to the running loop when created.
+    Falls back to memory-only if langgraph-checkpoint-sqlite isn't installed.
+    """
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        from langgraph.checkpoint.memory import InMemorySaver
+        print("ℹ️ langgraph-checkpoint-sqlite not installed: conversation memory won't survive restarts")
+        return InMemorySaver()
+    saver = AsyncSqliteSaver(await aiosqlite.connect(path))
+    await saver.setup()  # Creates the tables and switches the database to WAL
+    return saver
+
+
+async def close_checkpointer(checkpointer):
+    conn = getattr(checkpointer, "conn", None)
+    if conn is not None:
+        await conn.close()
+
+
+async def load_history(graph, config):
+    """The thread's messages before a turn: what every hedged lane starts from."""
+    snapshot = await graph.aget_state(config)
+    return snapshot.values.get("messages", [])
+
+
+async def commit_turn(graph, config, messages):
+    """
+    Appends one turn's messages to the thread, as if the agent had produced them.
+    Lanes run without the checkpointer, so only the winner's messages are ever written.
+    """
+    await graph.aupdate_state(config, {"messages": messages}, as_node="agent")
+
+
+def close_turn(messages, turn, reply):
+    """
+    Messages for a turn that ended early (barge-in, or no model answered): every tool call
+    left without a result gets a cancelled one, so the next model call sees a valid
+    history, and reply ends the turn (appended to the final answer if there already is
+    one). turn is the user's message, used when the lane hadn't reported any state yet.
+    """
+    messages = list(messages) or [turn]
+    answered = {m.tool_call_id for m in messages if isinstance(m, ToolMessage)}
+    for message in list(messages):
+        for call in getattr(message, "tool_calls", None) or []:
+            if call["id"] not in answered:
+                messages.append(ToolMessage(content=CANCELLED_TOOL_RESULT, tool_call_id=call["id"], name=call["name"]))
+    last = messages[-1]
+    if isinstance(last, AIMessage) and not last.tool_calls and isinstance(last.content, str):
+        messages[-1] = last.model_copy(update={"content": f"{last.content} {reply}".strip()})
+    else:
+        messages.append(AIMessage(content=reply))
+    return messages
+
+
+def _text(message):
+    content = message.content
+    if not isinstance(content, str):
+        content = " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    calls = getattr(message, "tool_calls", None)
+    if calls:
+        content += json.dumps([{"name": c["name"], "args": c["args"]} for c in calls])
+    return content
+
+
+def estimate_tokens(messages):
+    """Rough token count (~4 characters per token, plus per-message overhead)."""
+    return sum(4 + len(_text(m)) // 4 for m in messages)
+
+
+def _split_turns(messages):
+    """Groups messages into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _strip_stale_tool_results(turns):
+    """Cuts tool results of every turn but the last one down to STALE_TOOL_CHARS."""
+    out = []
+    for i, turn in enumerate(turns):
+        for message in turn:
+            if (isinstance(message, ToolMessage) and i < len(turns) - 1
+                    and len(_text(message)) > STALE_TOOL_CHARS):
+                message = message.model_copy(update={"content": _text(message)[:STALE_TOOL_CHARS] + " …[trimmed]"})
+            out.append(message)
+    return out
+
+
+def _split_summary(messages):
+    if messages and messages[0].id == SUMMARY_ID:
+        return messages[0], messages[1:]
+    return None, messages
+
+
+class ConversationMemory:
+    """
+    Keeps each thread's history within TOKEN_BUDGET.
+    On the hot path, pre_model_hook only trims what the model sees: stale tool results
+    are shortened and, if a turn still overflows, the oldest turns are left out.
+    Between turns, compact() folds everything but the newest KEEP_RECENT_TOKENS into a
+    running summary (a system message at the top of the thread) with a cheap LLM call.
+    """
+
+    def __init__(self, summarizers, budget=TOKEN_BUDGET, keep_recent=KEEP_RECENT_TOKENS):
+        self.summarizers = summarizers  # Chat models tried in order
+        self.budget = budget
+        self.keep_recent = keep_recent
+        self.prompt_tokens = []  # Estimated prompt size of each model call in the current turn
+        self.turn_prompt_tokens = []  # Per finished turn: list of per-call prompt sizes
+        self._lock = asyncio.Lock()  # Turns and compaction writes never interleave
+
+    def hook(self, system_prompt):
+        """pre_model_hook for create_react_agent (the system prompt is counted, not added)."""
+        prompt_tokens = 4 + len(system_prompt) // 4
+
+        def pre_model_hook(state):
+            summary, rest = _split_summary(state["messages"])
+            head = [summary] if summary is not None else []
+            turns = _split_turns(rest)
+            messages = _strip_stale_tool_results(turns)
+            # Safety net for a single very long session between compactions
+            while len(turns) > 1 and estimate_tokens(head + messages) > self.budget * 2:
+                turns = turns[1:]
+                messages = _strip_stale_tool_results(turns)
+            messages = head + messages
+            self.prompt_tokens.append(prompt_tokens + estimate_tokens(messages))
+            return {"llm_input_messages": messages}
+
+        return pre_model_hook
+
+    @contextlib.asynccontextmanager
+    async def turn(self):
+        """Wraps one user turn: blocks compaction writes and reports prompt tokens afterwards."""
+        async with self._lock:
+            self.prompt_tokens = []
+            try:
+                yield
+            finally:
+                if self.prompt_tokens:
+                    self.turn_prompt_tokens.append(self.prompt_tokens)
+                    calls = " + ".join(str(t) for t in self.prompt_tokens)
+                    print(f"\n🧮 Prompt tokens this turn: {calls} (~{sum(self.prompt_tokens)} total)")
+
+    async def _summarize(self, previous, turns):
+        excerpt = "\n".join(
+            f"{type(m).__name__.replace('Message', '')}: {_text(m)}"
+            for m in _strip_stale_tool_results(turns + [[]])
+        )
+        request = [
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Previous summary:\n{previous or '(none)'}\n\nNew excerpt:\n{excerpt}"),
+        ]
+        for model in self.summarizers:
+            try:
+                return (await model.ainvoke(request)).content.strip()
+            except Exception as e:
+                print(f"⚠️ Summarizer failed: {e}")
+        return None
+
+    async def compact(self, graph, config):
+        """
+        Summarizes old turns if the thread is over budget. Meant to run in the background
+        after a turn; if a new turn changes the thread meanwhile, the result is dropped.
+        Returns True if the thread was rewritten.
+        """
+        try:
+            return await self._compact(graph, config)
+        except Exception as e:
+            print(f"⚠️ Memory compaction failed: {e}")
+            return False
+
+    async def _compact(self, graph, config):
+        snapshot = await graph.aget_state(config)
+        messages = snapshot.values.get("messages", [])
+        if estimate_tokens(messages) <= self.budget:
+            return False
+
+        summary, rest = _split_summary(messages)
+        turns = _split_turns(rest)
+        kept, kept_tokens = [], 0
+        while turns and (not kept or kept_tokens + estimate_tokens(turns[-1]) <= self.keep_recent):
+            kept_tokens += estimate_tokens(turns[-1])
+            kept.insert(0, turns.pop())
+        if not turns:
+            return False
+
+        previous = summary.content[len(SUMMARY_PREFIX):] if summary is not None else None
+        new_summary = await self._summarize(previous, turns)
+        if not new_summary:
+            return False
+
+        async with self._lock:
+            current = await graph.aget_state(config)
+            if current.config["configurable"].get("checkpoint_id") != snapshot.config["configurable"].get("checkpoint_id"):
+                return False  # A turn happened meanwhile; try again after the next one
+            await graph.aupdate_state(
+                config,
+                {"messages": [
+                    RemoveMessage(id=REMOVE_ALL_MESSAGES),
+                    SystemMessage(content=SUMMARY_PREFIX + new_summary, id=SUMMARY_ID),
+                    *[m for turn in kept for m in turn],
+                ]},
+                as_node="agent",
+            )
+        before = estimate_tokens(messages)
+        after = estimate_tokens([SystemMessage(content=new_summary)] + [m for turn in kept for m in turn])
+        print(f"🗜️ Memory compacted: ~{before} -> ~{after} tokens")
+        return True
@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import mmap
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tts_cache")
+MEMORY_BUDGET_BYTES = 32 * 1024 * 1024  # PCM kept in RAM (~11 minutes at 24 kHz PCM16)
+DISK_BUDGET_BYTES = 512 * 1024 * 1024  # The append-only store stops growing past this
+MAX_PHRASE_CHARS = 120  # Longer sentences are one-offs from the LLM, not worth caching
+ADMIT_AFTER = 2  # Unregistered phrases are cached from their Nth synthesis on (one-off answers never are)
+SEEN_MAX = 4096  # Phrases whose synthesis count is remembered (least recent forgotten first)
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Cache key form of a phrase: case and spacing don't change the audio."""
+    return _SPACES.sub(" ", text).strip().lower()
+
+
+def phrase_key(text, voice, cfg, steps):
+    raw = json.dumps([normalize(text), voice, cfg, steps])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class PhraseCache:
+    """
+    PCM16 cache of synthesized phrases, keyed by (normalized text, voice, cfg, steps).
+    Only phrases worth it are stored: registered ones (pre-warmed fillers, fallbacks)
+    and short ones synthesized ADMIT_AFTER times. Recently used phrases live in an
+    in-memory LRU bounded by MEMORY_BUDGET_BYTES. Everything is also appended to
+    CACHE_DIR/pcm.bin (read back through mmap) with an index.jsonl of offsets, so the
+    cache survives restarts; the appends run on a writer thread, off the event loop.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, memory_budget=MEMORY_BUDGET_BYTES, disk_budget=DISK_BUDGET_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory = OrderedDict()  # key -> PCM16 bytes, least recently used first
+        self.memory_bytes = 0
+        self.index = {}  # key -> (offset, length) in pcm.bin
+        self.registered = set()  # Normalized phrases always admitted
+        self.seen = OrderedDict()  # Normalized phrase -> syntheses so far
+        self._writing = set()  # Keys queued for the writer thread
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-cache")
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._map = None
+        self._pcm_path = os.path.join(cache_dir, "pcm.bin")
+        self._index_path = os.path.join(cache_dir, "index.jsonl")
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self._index_path):
+            return
+        size = os.path.getsize(self._pcm_path) if os.path.exists(self._pcm_path) else 0
+        with open(self._index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a crash
+                # Entries pointing past the end of pcm.bin are from an interrupted write
+                if entry["offset"] + entry["length"] <= size:
+                    self.index[entry["key"]] = (entry["offset"], entry["length"])
+
+    @property
+    def disk_bytes(self):
+        return os.path.getsize(self._pcm_path) if os.path.exists(self._pcm_path) else 0
+
+    def _read_disk(self, offset, length):
+        if self._map is None or offset + length > len(self._map):
+            # The file has grown since it was mapped
+            if self._map is not None:
+                self._map.close()
+            with open(self._pcm_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def _remember(self, key, pcm):
+        if len(pcm) > self.memory_budget:
+            return
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+        self.memory[key] = pcm
+        self.memory_bytes += len(pcm)
+        while self.memory_bytes > self.memory_budget:
+            _, old = self.memory.popitem(last=False)
+            self.memory_bytes -= len(old)
+
+    def get(self, text, voice, cfg, steps):
+        """PCM16 bytes for the phrase, or None (counted as a miss)."""
+        key = phrase_key(text, voice, cfg, steps)
+        pcm = self.memory.get(key)
+        if pcm is not None:
+            self.memory.move_to_end(key)
+            self.hits_memory += 1
+            return pcm
+        if key in self.index:
+            pcm = self._read_disk(*self.index[key])
+            self._remember(key, pcm)
+            self.hits_disk += 1
+            return pcm
+        self.misses += 1
+        return None
+
+    def has(self, text, voice, cfg, steps):
+        """True if the phrase is cached (not counted in the statistics)."""
+        key = phrase_key(text, voice, cfg, steps)
+        return key in self.memory or key in self.index
+
+    def register(self, phrases):
+        """Phrases to cache from their first synthesis on (e.g. the ones pre-warmed at startup)."""
+        self.registered.update(normalize(text) for text in phrases)
+
+    def admit(self, text):
+        """
+        Called once per synthesis of text: True if the result should be stored, i.e. the
+        phrase is registered, or is short and has now been synthesized ADMIT_AFTER times.
+        """
+        phrase = normalize(text)
+        if phrase in self.registered:
+            return True
+        if not 0 < len(phrase) <= MAX_PHRASE_CHARS:
+            return False
+        count = self.seen.pop(phrase, 0) + 1
+        self.seen[phrase] = count
+        if len(self.seen) > SEEN_MAX:
+            self.seen.popitem(last=False)
+        return count >= ADMIT_AFTER
+
+    def put(self, text, voice, cfg, steps, pcm):
+        """Stores a complete synthesis of the phrase in memory now and on disk in the background."""
+        if not pcm:
+            return
+        key = phrase_key(text, voice, cfg, steps)
+        self._remember(key, pcm)
+        if key in self.index or key in self._writing:
+            return
+        self._writing.add(key)
+        self._writer.submit(self._append, key, normalize(text), pcm)
+
+    def _append(self, key, text, pcm):
+        """Writer thread: appends one phrase to pcm.bin and index.jsonl."""
+        try:
+            offset = self.disk_bytes
+            if offset + len(pcm) > self.disk_budget:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Audio first, then the index line that makes it visible
+            with open(self._pcm_path, "ab") as f:
+                f.write(pcm)
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "offset": offset, "length": len(pcm), "text": text}) + "\n")
+            self.index[key] = (offset, len(pcm))
+        except OSError as e:
+            print(f"⚠️ Could not write TTS cache: {e}")
+        finally:
+            self._writing.discard(key)
+
+    def stats(self):
+        lookups = max(self.hits_memory + self.hits_disk + self.misses, 1)
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups,
+            "memory_bytes": self.memory_bytes,
+            "disk_bytes": self.disk_bytes,
+            "phrases": len(self.index),
+        }
+
+    def close(self):
+        """Finishes the queued disk writes, then unmaps the store."""
+        self._writer.shutdown(wait=True)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
@@ -0,0 +1,309 @@
+import time
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity ring buffer of audio samples with one writer and any number of readers.
+    Positions are absolute sample counts since the buffer was created, so every reader
+    can keep its own offset and a position stays meaningful after the buffer wraps.
+    """
+
+    def __init__(self, capacity, dtype=np.int16, data=None):
+        self.capacity = int(capacity)
+        self._cond = threading.Condition()
+        if data is None:
+            self._data = np.zeros(self.capacity, dtype=dtype)
+            self.write_pos = 0
+        else:
+            self._data = data
+
+    @property
+    def oldest_pos(self):
+        """Oldest absolute position that has not been overwritten yet."""
+        return max(0, self.write_pos - self.capacity)
+
+    def write(self, samples, notify=True):
+        """
+        Copies samples in at the write position (wrapping if needed) and wakes readers.
+        With notify=False no lock is taken (safe in an audio callback): readers then have
+        to poll write_pos instead of blocking in wait_for.
+        """
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+            self.write_pos += n - self.capacity
+            n = self.capacity
+
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+
+        if not notify:
+            self.write_pos += n  # Single writer: readers see the data before the new position
+            return
+        with self._cond:
+            self.write_pos += n
+            self._cond.notify_all()
+
+    def read(self, pos, n, out=None):
+        """
+        Copies n samples starting at absolute position pos into out (allocated if None).
+        The caller must make sure [pos, pos + n) is still inside the buffer.
+        """
+        if out is None:
+            out = np.empty(n, dtype=self._data.dtype)
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        if first < n:
+            out[first:n] = self._data[:n - first]
+        return out
+
+    def wait_for(self, pos, timeout=None):
+        """Blocks until the write position reaches pos. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.write_pos >= pos, timeout)
+
+    def reader(self, start=None):
+        """Returns a RingReader starting at start (defaults to the live write position)."""
+        return RingReader(self, start)
+
+
+class SharedAudioRing(AudioRingBuffer):
+    """
+    AudioRingBuffer whose samples and write position live in shared memory, so a
+    worker process can attach to it by name and read the same audio with no copies
+    through pipes. Only the creating process may write. Writes never take a lock (the
+    writer is the mic's realtime callback), so readers in every process poll write_pos.
+    """
+
+    POLL_S = 0.01  # How often a waiting reader checks for new audio
+
+    def __init__(self, capacity, dtype=np.int16, name=None):
+        self.owner = name is None
+        size = 8 + int(capacity) * np.dtype(dtype).itemsize
+        self._shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        self._pos = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf[:8])
+        data = np.ndarray((int(capacity),), dtype=dtype, buffer=self._shm.buf[8:size])
+        super().__init__(capacity, dtype, data)
+        if self.owner:
+            self.write_pos = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def write_pos(self):
+        return int(self._pos[0])
+
+    @write_pos.setter
+    def write_pos(self, value):
+        self._pos[0] = value
+
+    def write(self, samples, notify=False):
+        """Lock-free write: publishes the new write_pos after the samples (see wait_for)."""
+        super().write(samples, notify=notify)
+
+    def wait_for(self, pos, timeout=None):
+        """Cheap polling, in the owning process as well as in attached ones."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.write_pos < pos:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_S)
+        return True
+
+    def close(self):
+        """Detaches (and frees, in the owning process) the shared memory."""
+        del self._pos, self._data
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+class RingReader:
+    """A consumer with its own offset into an AudioRingBuffer."""
+
+    def __init__(self, ring, start=None):
+        self.ring = ring
+        self.pos = ring.write_pos if start is None else max(start, ring.oldest_pos)
+        self.overruns = 0
+
+    def available(self):
+        return self.ring.write_pos - self.pos
+
+    def read(self, n, timeout=None, out=None):
+        """
+        Blocks until n samples are available and returns them, advancing the offset.
+        Returns None on timeout. If the reader fell behind the writer it skips ahead
+        to the oldest retained audio and counts an overrun.
+        """
+        if not self.ring.wait_for(self.pos + n, timeout):
+            return None
+        if self.pos < self.ring.oldest_pos:
+            self.pos = self.ring.oldest_pos
+            self.overruns += 1
+        chunk = self.ring.read(self.pos, n, out)
+        self.pos += n
+        return chunk
+
+    def seek(self, pos):
+        self.pos = max(pos, self.ring.oldest_pos)
+
+
+class GrowableAudioBuffer:
+    """
+    Preallocated, growable float32 buffer for one utterance.
+    int16 frames are scaled into place as they arrive, so view() can be handed
+    straight to WhisperModel.transcribe without joining, WAV encoding or decoding.
+    """
+
+    SCALE = np.float32(1.0 / 32768.0)
+
+    def __init__(self, capacity):
+        self._data = np.empty(int(capacity), dtype=np.float32)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, samples):
+        """Appends int16 (or float32) samples, doubling the storage if it is full."""
+        n = len(samples)
+        end = self._len + n
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)), dtype=np.float32)
+            grown[:self._len] = self._data[:self._len]
+            self._data = grown
+
+        dst = self._data[self._len:end]
+        if samples.dtype == np.int16:
+            np.multiply(samples, self.SCALE, out=dst, casting="unsafe")
+        else:
+            dst[:] = samples
+        self._len = end
+
+    def view(self, start=0):
+        """Returns a float32 view (no copy) of everything appended after start."""
+        n = self._len
+        return self._data[start:n]
+
+    def clear(self):
+        self._len = 0
+
+
+class PlaybackRing:
+    """
+    Preallocated single-producer / single-consumer int16 ring for the speaker.
+    The event loop writes synthesized PCM16 in; the audio callback reads it out as
+    float32 with one vectorized conversion (two at the wrap point). No locks: the
+    producer only advances write_pos and the consumer only advances read_pos, and
+    flush() asks the consumer to skip ahead instead of touching read_pos itself.
+    """
+
+    SCALE = np.float32(1.0 / 32768.0)
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.int16)
+        self.write_pos = 0
+        self.read_pos = 0
+        self._flush_to = 0
+        self.streaming = False  # Set by the producer while more audio is on its way
+        self._starved = True
+        # Counters
+        self.samples_played = 0
+        self.underruns = 0  # Callbacks that ran dry while streaming after audio had been flowing
+        self.peak_fill = 0
+
+    def available(self):
+        """Samples queued and not yet handed to the device."""
+        return self.write_pos - max(self.read_pos, self._flush_to)
+
+    def free(self):
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def write(self, samples):
+        """Copies as many int16 samples as fit. Returns how many were written."""
+        n = min(len(samples), self.free())
+        if n <= 0:
+            return 0
+        start = self.write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:n]
+        self.write_pos += n
+        self.peak_fill = max(self.peak_fill, self.available())
+        return n
+
+    def rewind(self, pos, guard):
+        """
+        Producer side: takes back queued audio from absolute position pos on, so it can
+        be rewritten (e.g. cross-faded). The guard samples right after the read
+        position are never taken back, since the callback may be reading them.
+        Returns the position writing resumes from.
+        """
+        pos = max(pos, self.read_pos + guard, self._flush_to)
+        if pos < self.write_pos:
+            self.write_pos = pos
+        return self.write_pos
+
+    def read(self, pos, n):
+        """Copy of n queued samples starting at absolute position pos."""
+        start = pos % self.capacity
+        first = min(n, self.capacity - start)
+        if first == n:
+            return self._data[start:start + n].copy()
+        return np.concatenate([self._data[start:], self._data[:n - first]])
+
+    def read_into(self, out):
+        """
+        Audio callback side: fills the float32 array out, zero-padding if the ring
+        runs dry. Returns the number of real samples written.
+        """
+        if self._flush_to > self.read_pos:
+            self.read_pos = self._flush_to
+        frames = len(out)
+        n = min(frames, self.write_pos - self.read_pos)
+        if n > 0:
+            start = self.read_pos % self.capacity
+            first = min(n, self.capacity - start)
+            np.multiply(self._data[start:start + first], self.SCALE, out=out[:first], dtype=np.float32)
+            if first < n:
+                np.multiply(self._data[:n - first], self.SCALE, out=out[first:n], dtype=np.float32)
+            self.read_pos += n
+            self.samples_played += n
+        if n < frames:
+            out[n:] = 0
+            if self.streaming and not self._starved:
+                self.underruns += 1
+            self._starved = True
+        else:
+            self._starved = False
+        return n
+
+    def flush(self):
+        """Drops everything queued (applied by the consumer on its next read)."""
+        self._flush_to = self.write_pos
+
+    def reset(self):
+        """Empties the ring. Only safe while the consumer is stopped."""
+        self.read_pos = self._flush_to = self.write_pos
+
+    def stats(self):
+        return {
+            "fill": self.available(),
+            "peak_fill": self.peak_fill,
+            "capacity": self.capacity,
+            "samples_played": self.samples_played,
+            "underruns": self.underruns,
+        }
@@ -1,42 +1,64 @@
-import webrtcvad
-import sounddevice as sd
 import numpy as np
-from faster_whisper import WhisperModel
 import collections
-import io
-import wave
 import sys
 import time
+import asyncio
+import threading
+import audio_capture
+from ring_buffer import GrowableAudioBuffer
+import whisper_backend
+from whisper_backend import DECODE_OPTIONS
+from endpointing import Endpointer
+from block_vad import BlockVAD
 
 # Constants
-RATE = 16000
+RATE = audio_capture.RATE
 FRAME_DURATION_MS = 30
 CHUNK_SIZE = int(RATE * FRAME_DURATION_MS / 1000)  # 480 samples
 VAD_MODE = 3  # Aggressiveness: 0-3
-SILENCE_DURATION_S = 1.0  # Stop generally after 1.0s of silence
+BLOCK_FRAMES = 5  # VAD scores this many frames per read (150 ms)
+SILENCE_DURATION_S = 1.0  # Stop generally after 1.0s of silence (until the endpointer learns the speaker)
 PRE_BUFFER_DURATION_S = 0.5 # Keep 0.5s before speech
+UTTERANCE_PREALLOC_S = 15  # Initial utterance buffer size (grows if exceeded)
+STOP_POLL_S = 0.2  # With a stop event, a silent / stalled mic is re-checked this often
 
-# Global Model Loading (Lazy loaded or on import)
-# Using 'cuda' and 'float16' as per user's test.py
-print("⏳ Loading Whisper Model...")
-model = WhisperModel('medium', device="cuda", compute_type="float16")
-print("✅ Whisper Model Loaded")
+# Streaming transcription
+PARTIAL_INTERVAL_S = 0.5  # Re-decode the growing utterance this often
+COMMIT_MARGIN_S = 1.0  # Segments ending this far behind the live edge are final
+MIN_PARTIAL_SAMPLES = int(RATE * 0.3)  # Don't bother decoding less than 300 ms
 
-vad = webrtcvad.Vad(VAD_MODE)
+# Global Model Loading (lazy: load() is called by the startup warm-up, or by the first command)
+# 'cuda' + 'float16' when a GPU is present, otherwise int8 on CPU sized by an RTF probe
+# (see whisper_backend.py for the knobs and the benchmark command)
+model = None
+_load_lock = threading.Lock()
 
-def is_speech(frame, sample_rate):
-    """Returns True if the frame contains speech."""
-    try:
-        return vad.is_speech(frame, sample_rate)
-    except:
-        return False
+block_vad = BlockVAD(VAD_MODE, RATE, CHUNK_SIZE)
+
+# Adaptive end-of-turn detection; keeps learning the speaker's pauses for the whole session
+endpointer = Endpointer(SILENCE_DURATION_S)
+
+def load():
+    """Loads Whisper once and runs a dummy decode, so the first command pays for neither."""
+    global model
+    with _load_lock:
+        if model is None:
+            loaded = whisper_backend.load_default_model()
+            list(loaded.transcribe(np.zeros(RATE, dtype=np.float32), **DECODE_OPTIONS)[0])  # Allocates / autotunes the decoder
+            model = loaded
+            print("✅ Whisper Model Loaded")
+    return model
 
-def take_command(timeout=None):
+def record_utterance(timeout=None, start_at=None, audio=None, stop=None):
     """
     Listens continuously until speech is detected, then records until silence.
-    Returns the transcribed text.
+    Returns a GrowableAudioBuffer with the utterance (pre-roll included), or None on timeout.
     Args:
         timeout: Max seconds to wait for speech start. If None, waits indefinitely.
+        start_at: Absolute capture position to start reading from (e.g. wakeword.detected_at),
+                  so speech that began before this call is still heard. Defaults to 'now'.
+        audio: Optional GrowableAudioBuffer to record into, so another thread can watch it grow.
+        stop: Optional threading.Event; once set, recording is abandoned and None returned.
     """
     
     # Ring buffer for pre-roll
@@ -44,76 +66,70 @@ def take_command(timeout=None):
     ring_buffer = collections.deque(maxlen=num_padding_chunks)
     
     triggered = False
-    voiced_frames = []
+    if audio is None:
+        audio = GrowableAudioBuffer(RATE * UTTERANCE_PREALLOC_S)
     
-    # Counter for silence duration
-    silence_chunks = 0
-    max_silence_chunks = int(SILENCE_DURATION_S / (FRAME_DURATION_MS / 1000))
+    frame_s = FRAME_DURATION_MS / 1000
     
     # Timeout tracking
     start_time = time.time() if timeout else None
     
     print(f"🎙️ Listening (VAD, timeout={timeout}s)...")
     
-    # Using a stream for low latency
-    with sd.InputStream(samplerate=RATE, channels=1, dtype='int16', blocksize=CHUNK_SIZE) as stream:
-        while True:
-            chunk, overflowed = stream.read(CHUNK_SIZE)
-            if overflowed:
-                pass
-                
-            # timeout check (only if not yet triggered)
-            if timeout and not triggered:
-                if (time.time() - start_time) > timeout:
-                    return None
-
-            # Convert to bytes for VAD
-            chunk_bytes = chunk.tobytes()
-            
-            # Helper to check speech
-            active = is_speech(chunk_bytes, RATE)
+    # Read from the shared, always-on microphone (no device open per turn)
+    reader = audio_capture.get_reader(start_at)
+    while True:
+        block = reader.read(CHUNK_SIZE * BLOCK_FRAMES, timeout=STOP_POLL_S if stop is not None else None)
+        if stop is not None and stop.is_set():
+            return None
+        if block is None:
+            continue
             
+        # timeout check (only if not yet triggered)
+        if timeout and not triggered:
+            if (time.time() - start_time) > timeout:
+                return None
+
+        # One vectorized VAD call for the whole block
+        decisions = block_vad.is_speech(block)
+        
+        for i, active in enumerate(decisions):
+            chunk = block[i * CHUNK_SIZE:(i + 1) * CHUNK_SIZE]
             if not triggered:
-                ring_buffer.append(chunk_bytes)
+                ring_buffer.append(chunk)
                 if active:
                     print("🗣️ Speech started...")
                     triggered = True
-                    voiced_frames.extend(ring_buffer) # Add pre-roll
-                    voiced_frames.append(chunk_bytes)
-                    silence_chunks = 0
+                    for frame in ring_buffer: # Add pre-roll
+                        audio.append(frame)
+                    endpointer.reset(len(audio) / RATE)
             else:
-                voiced_frames.append(chunk_bytes)
-                if active:
-                    silence_chunks = 0
-                else:
-                    silence_chunks += 1
+                audio.append(chunk)
                 
-                # Check if silence exceeded limit
-                if silence_chunks > max_silence_chunks:
-                    print("🤫 Silence detected, processing...")
-                    triggered = False
-                    break
+                # Check if silence exceeded the (adaptive) limit
+                if endpointer.update(active, frame_s):
+                    print(f"🤫 Silence detected ({endpointer.silence_s:.2f}s), processing...")
+                    return audio
+
+def take_command(timeout=None, start_at=None):
+    """
+    Listens continuously until speech is detected, then records until silence.
+    Returns the transcribed text.
+    Args:
+        timeout: Max seconds to wait for speech start. If None, waits indefinitely.
+        start_at: Absolute capture position to start reading from (e.g. wakeword.detected_at),
+                  so speech that began before this call is still heard. Defaults to 'now'.
+    """
+    audio = record_utterance(timeout, start_at)
 
     # Process audio
-    if not voiced_frames:
+    if not audio:
         return None
 
-    # Stitch frames
-    audio_data = b''.join(voiced_frames)
-    
-    # Create wav in memory
-    byte_io = io.BytesIO()
-    with wave.open(byte_io, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(RATE)
-        wf.writeframes(audio_data)
-    
-    byte_io.seek(0)
-    
     # Transcribe
     try:
-        segments, _ = model.transcribe(byte_io)
+        # float32 array goes straight in: no joining, no WAV round trip
+        segments, _ = load().transcribe(audio.view(), **DECODE_OPTIONS)
         text = " ".join(segment.text for segment in segments).strip()
         if text:
             print(f"✅ Heard: {text}")
@@ -124,6 +140,98 @@ def take_command(timeout=None):
         print(f"❌ Transcription error: {e}")
         return None
 
+def _decode(audio, prompt=None):
+    """Transcribes a float32 array (view, no copy) and returns the list of segments."""
+    segments, _ = load().transcribe(
+        audio,
+        initial_prompt=prompt or None,
+        condition_on_previous_text=False,
+        **DECODE_OPTIONS,
+    )
+    return list(segments)
+
+async def stream_command(timeout=None, start_at=None):
+    """
+    Streaming version of take_command.
+    Async generator yielding (text, is_final) while the user is still speaking.
+    The growing utterance is re-decoded every PARTIAL_INTERVAL_S; segments that end
+    more than COMMIT_MARGIN_S before the live edge are committed and never decoded
+    again, so the final decode at end-of-speech only covers the short uncommitted tail.
+    Partials are also fed to the endpointer, so a finished-sounding command ends the turn early.
+    Yields nothing if no speech starts before the timeout.
+    """
+    audio = GrowableAudioBuffer(RATE * UTTERANCE_PREALLOC_S)
+    stop = threading.Event()  # Cancelling the task can't stop the thread; this does
+    capture = asyncio.create_task(
+        asyncio.to_thread(record_utterance, timeout, start_at, audio, stop)
+    )
+
+    committed = []          # Committed segment texts
+    committed_samples = 0   # Audio already covered by committed text
+    last_partial = ""
+
+    try:
+        while not capture.done():
+            await asyncio.wait({capture}, timeout=PARTIAL_INTERVAL_S)
+            if capture.done() or not audio:
+                continue
+
+            window = audio.view(committed_samples)
+            if len(window) < MIN_PARTIAL_SAMPLES:
+                continue
+
+            try:
+                segments = await asyncio.to_thread(_decode, window, " ".join(committed))
+            except Exception as e:
+                print(f"❌ Partial transcription error: {e}")
+                continue
+
+            # Commit everything that is safely behind the live edge
+            # (the last segment is always kept open, it may still change)
+            horizon = len(window) / RATE - COMMIT_MARGIN_S
+            n_commit = 0
+            while n_commit < len(segments) - 1 and segments[n_commit].end <= horizon:
+                n_commit += 1
+            if n_commit:
+                committed.extend(seg.text.strip() for seg in segments[:n_commit])
+                committed_samples += int(segments[n_commit - 1].end * RATE)
+            pending = [seg.text.strip() for seg in segments[n_commit:]]
+
+            partial = " ".join(committed + pending).strip()
+            endpointer.set_transcript(partial, (committed_samples + len(window)) / RATE)
+            if partial and partial != last_partial:
+                last_partial = partial
+                yield partial, False
+
+        if capture.result() is None:
+            return
+    except BaseException:
+        stop.set()
+        capture.cancel()
+        raise
+
+    # Short tail decode: only the audio after the last committed segment
+    try:
+        segments = await asyncio.to_thread(_decode, audio.view(committed_samples), " ".join(committed))
+    except Exception as e:
+        print(f"❌ Transcription error: {e}")
+        segments = []
+
+    text = " ".join(committed + [seg.text.strip() for seg in segments]).strip()
+    if text:
+        print(f"✅ Heard: {text}")
+    yield text or None, True
+
+async def take_command_async(timeout=None, start_at=None):
+    """Awaitable take_command built on stream_command; prints partials as they arrive."""
+    text = None
+    async for hypothesis, is_final in stream_command(timeout, start_at):
+        if is_final:
+            text = hypothesis
+        else:
+            print(f"📝 {hypothesis}")
+    return text
+
 if __name__ == "__main__":
     while True:
         res = take_command()
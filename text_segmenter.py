@@ -0,0 +1,244 @@
+import re
+
+# Incremental LLM text -> speakable segments, in two single-pass stages:
+#   MarkupFilter     strips <think> blocks, code and markdown emphasis, even when a tag or
+#                    fence is split across chunks (a possibly-partial token is held back)
+#   SpeechSegmenter  cuts the clean text into segments for TTS: the first one as early as
+#                    a clause allows (time to first audio), later ones coalesced into
+#                    growing chunks (fewer, longer TTS requests)
+# Both only look at text they haven't processed yet, so a long answer costs O(n) overall.
+
+# Configuration
+FIRST_MIN_CHARS = 20  # The first segment may end at a clause boundary (, ; : —) once this long
+FIRST_MAX_CHARS = 120  # ...and is cut at a space if no boundary shows up by then
+TARGET_CHARS = 80  # Later segments end at the first sentence end past this length...
+TARGET_GROWTH = 2.0  # ...which grows by this factor per segment...
+MAX_TARGET_CHARS = 240  # ...up to this
+MAX_CHARS = 300  # Hard cut (at a clause boundary or space) for run-on text
+
+_TEXT, _THINK, _FENCE, _INLINE = range(4)
+
+_TEXT_TOKEN = re.compile(r"</?think>|`+|\*+|\.{2,}|…")
+_CLOSER = {
+    _THINK: re.compile(r"</think>"),
+    _FENCE: re.compile(r"```"),
+    _INLINE: re.compile(r"[`\n]"),
+}
+_PARTIAL = {  # Literals whose beginning may be at the end of a chunk, per mode
+    _TEXT: ("<think>", "</think>"),
+    _THINK: ("</think>",),
+    _FENCE: ("```",),
+}
+_TRAILING_RUN = re.compile(r"(?:`+|\.+)$")  # Could still grow (` into ```, .. into ...)
+
+# A sentence ends at . ! ? or an ellipsis (not after a digit: "4.2", "1. ") followed by
+# whitespace, or at a line break; a clause at , ; : or a dash followed by whitespace
+_BOUNDARY = re.compile(r"(?<![0-9])[.!?…]+[\"')\]]*(?P<sentence>\s)|(?P<line>\n)|[,;:—–]\s")
+_SCAN_OVERLAP = 16  # Unfinished boundaries are re-scanned from this far back
+_SPACES = re.compile(r"\s+")
+_LAST_SPACE = re.compile(r".*\s", re.DOTALL)
+
+
+def speakable(text):
+    """Final form of a segment: ellipses dropped, whitespace collapsed."""
+    return _SPACES.sub(" ", text.replace("…", " ")).strip()
+
+
+def _partial_suffix(text, literals):
+    """Length of the longest end of text that is the beginning of one of literals."""
+    longest = 0
+    for literal in literals:
+        for n in range(min(len(literal) - 1, len(text)), longest, -1):
+            if text.endswith(literal[:n]):
+                longest = n
+                break
+    return longest
+
+
+class MarkupFilter:
+    """Streams text through with <think> blocks, code and * emphasis removed."""
+
+    def __init__(self):
+        self._mode = _TEXT
+        self._pending = ""  # Unprocessed tail: possibly partial token, or open inline code
+
+    def feed(self, chunk, final=False):
+        """Returns the visible text that chunk completes (possibly empty)."""
+        text = self._pending + chunk
+        out = []
+        i = 0
+        while True:
+            if self._mode == _TEXT:
+                m = _TEXT_TOKEN.search(text, i)
+                if m is None:
+                    break
+                token = m.group()
+                if not final and m.end() == len(text) and token[0] in "`.":
+                    break  # The run may continue in the next chunk
+                out.append(text[i:m.start()])
+                if token == "<think>":
+                    self._mode = _THINK
+                elif token[0] == "`":
+                    if len(token) != 2:  # `` is empty inline code
+                        self._mode = _FENCE if len(token) > 2 else _INLINE
+                elif token[0] in ".…":
+                    out.append("…")
+                i = m.end()  # </think> without an opening tag and * runs are just dropped
+            else:
+                m = _CLOSER[self._mode].search(text, i)
+                if m is None:
+                    break
+                if m.group() == "\n":
+                    out.append(text[i:m.end()])  # A stray backtick, not inline code
+                i = m.end()
+                self._mode = _TEXT
+
+        rest = text[i:]
+        if final:
+            self._pending, mode, self._mode = "", self._mode, _TEXT
+            if mode in (_TEXT, _INLINE):  # Unclosed inline code was a stray backtick after all
+                out.append(rest)
+        elif self._mode == _INLINE:
+            self._pending = rest  # Kept: spoken after all if the line ends unclosed
+        else:
+            m = _TRAILING_RUN.search(rest) if self._mode == _TEXT else None
+            hold = max(_partial_suffix(rest, _PARTIAL[self._mode]), len(m.group()) if m else 0)
+            if self._mode == _TEXT:
+                out.append(rest[:len(rest) - hold])
+            self._pending = rest[len(rest) - hold:]
+        return "".join(out)
+
+    def flush(self):
+        """Returns what was held back at the end of the stream (an unclosed think block or fence is dropped)."""
+        return self.feed("", final=True)
+
+
+class SpeechSegmenter:
+    """Cuts clean streaming text into segments for TTS (see the module comment)."""
+
+    def __init__(self, first_min=FIRST_MIN_CHARS, first_max=FIRST_MAX_CHARS, target=TARGET_CHARS,
+                 growth=TARGET_GROWTH, max_target=MAX_TARGET_CHARS, max_chars=MAX_CHARS):
+        self.first_min = first_min
+        self.first_max = first_max
+        self.target = target
+        self.growth = growth
+        self.max_target = max_target
+        self.max_chars = max_chars
+        self.emitted = 0  # Segments produced so far
+        self._text = ""  # Not yet emitted
+        self._scan = 0  # Boundary search resumes here...
+        self._boundaries = []  # ...having found these: (end position, is sentence end)
+
+    def _target(self):
+        return min(self.max_target, self.target * self.growth ** (self.emitted - 1))
+
+    def _cut(self):
+        """Position to end the next segment at, if it can be decided yet."""
+        first = self.emitted == 0
+        limit = self.first_max if first else self.max_chars
+        target = 0 if first else self._target()
+        last_clause = None
+        for pos, sentence in self._boundaries:
+            if pos > limit:
+                break
+            if sentence and pos >= target:
+                return pos
+            if not sentence and first and pos >= self.first_min:
+                return pos
+            last_clause = pos
+        if len(self._text) <= limit:
+            return None
+        if last_clause is not None:
+            return last_clause
+        m = _LAST_SPACE.match(self._text, 0, limit)
+        return m.end() if m else limit
+
+    def _emit(self, pos):
+        segment = speakable(self._text[:pos])
+        self._text = self._text[pos:]
+        self._boundaries = [(p - pos, s) for p, s in self._boundaries if p > pos]
+        self._scan = max(0, self._scan - pos)
+        if segment:
+            self.emitted += 1
+        return segment
+
+    def feed(self, text):
+        """Returns the segments completed by text (usually none or one)."""
+        self._text += text
+        for m in _BOUNDARY.finditer(self._text, self._scan):
+            self._boundaries.append((m.end(), m.lastgroup is not None))
+            self._scan = m.end()
+        self._scan = max(self._scan, len(self._text) - _SCAN_OVERLAP)
+
+        segments = []
+        while True:
+            pos = self._cut()
+            if pos is None:
+                return segments
+            segment = self._emit(pos)
+            if segment:
+                segments.append(segment)
+
+    def flush(self):
+        """Returns the remaining text as the last segment(s)."""
+        segments = self.feed("")
+        segment = self._emit(len(self._text))
+        self._scan = 0
+        self._boundaries = []
+        return segments + ([segment] if segment else [])
+
+
+def segment(text):
+    """
+    One-shot version of the pipeline for a whole string: the segments it would be spoken
+    as when streamed (e.g. phrases to pre-warm, so they match the phrase cache exactly).
+    """
+    markup, segmenter = MarkupFilter(), SpeechSegmenter()
+    return segmenter.feed(markup.feed(text) + markup.flush()) + segmenter.flush()
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    SAMPLES = [
+        "<think>The user wants the lights red. I should call the tool.</think>Sure, turning the lights red now. "
+        "Done! Anything else?",
+        "Hmm, let's see... The forecast says 4.2 degrees, so wear a coat. Also, **bring** an *umbrella*; "
+        "it might rain later. Here's how: ```python\nprint('hi')\n``` and that's it. Use `ls -la` to check.",
+        "Okay.",
+        "First, there's the kitchen light, then the hallway, and finally the porch — all three are on.\n"
+        "Second line without punctuation\nThird… and last!",
+        "It`s a stray backtick. But the rest\nstill gets spoken. " + "Run on text without any boundary " * 12,
+        "<think>\nmulti\nline\n</think>\n\nAnswer: 42. " + " ".join(f"Sentence number {i} is here." for i in range(40)),
+    ]
+
+    def run(chunks):
+        markup, segmenter, out = MarkupFilter(), SpeechSegmenter(), []
+        for chunk in chunks:
+            out += segmenter.feed(markup.feed(chunk))
+        out += segmenter.feed(markup.flush())
+        return out + segmenter.flush()
+
+    def splits(text, rng):
+        yield [text]
+        yield list(text)  # One character per chunk: every tag and fence is split
+        for _ in range(200):
+            cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(1, 30))))
+            yield [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+    rng = random.Random(0)
+    for text in SAMPLES:
+        reference = run([text])
+        assert all(t not in s for s in reference for t in ("think", "`", "*", "print(", "..")), reference
+        for chunks in splits(text, rng):
+            assert run(chunks) == reference, (chunks, run(chunks), reference)
+        print(f"✅ {len(reference)} segments, identical for every split: {[len(s) for s in reference]}")
+        print(f"   first: {reference[0]!r}")
+
+    # Linear time: 20x the text should take ~20x as long, not ~400x
+    tokens = " ".join(f"Sentence {i}, with a clause and an end." for i in range(2000)).split(" ")
+    for n in (len(tokens) // 20, len(tokens)):
+        start = time.perf_counter()
+        run([t + " " for t in tokens[:n]])
+        print(f"⏱️ {n} tokens: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,123 @@
+import time
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.tools import BaseTool, StructuredTool
+
+# Configuration
+TOOL_WORKERS = 4  # Blocking tools running at once (shared by both agents)
+DEFAULT_TIMEOUT_S = 10.0
+TOOL_TIMEOUTS_S = {  # Per tool; the model gets an error result instead of waiting longer
+    "control_wled": 3.0,
+    "get_current_date_time": 1.0,
+    "get_system_info": 5.0,
+    "window_tool": 10.0,
+    "play_on_yt": 15.0,
+    "tavily_search": 15.0,
+}
+
+pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def _is_async(tool):
+    """True if the tool has a native coroutine (rather than langchain's run-in-thread fallback)."""
+    if isinstance(tool, StructuredTool):
+        return tool.coroutine is not None
+    return type(tool)._arun is not BaseTool._arun
+
+
+def concurrent_tools(tools, timeouts=TOOL_TIMEOUTS_S, default_timeout=DEFAULT_TIMEOUT_S, executor=pool):
+    """
+    Wraps tools so the agent's tool node (which gathers the calls of one model step and
+    returns the results in call order) runs them side by side: blocking tools on the
+    bounded pool, async tools natively, each under its own timeout. "Dim the lights and
+    tell me the battery" then costs the slower of the two calls, not their sum.
+    A timed-out or cancelled call is abandoned; a blocking one finishes in its thread
+    (every HTTP call in tools.py has its own timeout) and its result is dropped.
+    """
+    wrapped = []
+    for tool in tools:
+        timeout = timeouts.get(tool.name, default_timeout)
+        native = _is_async(tool)
+
+        def run(_tool=tool, **kwargs):
+            return _tool.invoke(kwargs)
+
+        async def arun(_tool=tool, _timeout=timeout, _native=native, **kwargs):
+            start = time.perf_counter()
+            if _native:
+                call = _tool.ainvoke(kwargs)
+            else:
+                # The copied context carries the hedging lane (see hedging.guard_tools) into the thread
+                context = contextvars.copy_context()
+                call = asyncio.get_running_loop().run_in_executor(
+                    executor, functools.partial(context.run, _tool.invoke, kwargs)
+                )
+            try:
+                return await asyncio.wait_for(call, _timeout)
+            except asyncio.TimeoutError:
+                print(f"\n⏱️ Tool {_tool.name} timed out after {time.perf_counter() - start:.1f}s")
+                return f"Error: {_tool.name} did not finish within {_timeout:g} seconds."
+
+        wrapped.append(StructuredTool.from_function(
+            func=run, coroutine=arun, name=tool.name, description=tool.description,
+            args_schema=tool.args_schema,
+        ))
+    return wrapped
+
+
+def shutdown():
+    """Drops queued tool calls; running ones are not waited for."""
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import tool
+    from langgraph.prebuilt import ToolNode
+
+    @tool
+    def slow_lights(level: int) -> str:
+        """Sets the light level (blocking, 1 s)."""
+        time.sleep(1.0)
+        return f"lights at {level}"
+
+    @tool
+    def slow_battery() -> str:
+        """Reads the battery (blocking, 1.5 s)."""
+        time.sleep(1.5)
+        return "battery 80%"
+
+    @tool
+    async def async_lookup(query: str) -> str:
+        """Looks something up (async, 1 s)."""
+        await asyncio.sleep(1.0)
+        return f"found {query}"
+
+    @tool
+    def hung_device() -> str:
+        """Never answers in time (blocking, 5 s)."""
+        time.sleep(5.0)
+        return "too late"
+
+    tools = [slow_lights, slow_battery, async_lookup, hung_device]
+    timeouts = {"hung_device": 2.0}
+    calls = [
+        {"name": "slow_lights", "args": {"level": 30}, "id": "1"},
+        {"name": "slow_battery", "args": {}, "id": "2"},
+        {"name": "async_lookup", "args": {"query": "weather"}, "id": "3"},
+        {"name": "hung_device", "args": {}, "id": "4"},
+    ]
+    message = AIMessage(content="", tool_calls=calls)
+
+    async def demo():
+        node = ToolNode(concurrent_tools(tools, timeouts))
+        start = time.perf_counter()
+        result = await node.ainvoke({"messages": [message]})
+        print(f"✅ {len(calls)} calls in {time.perf_counter() - start:.2f}s (sequential: ~8.5s, timeout: 2s)")
+        for m in result["messages"]:
+            print(f"   {m.tool_call_id}: {m.content}")
+
+    asyncio.run(demo())
+    shutdown()
@@ -9,9 +9,8 @@ from datetime import datetime
 import psutil
 import subprocess
 from typing import Optional
-import requests
-import json
 from dotenv import load_dotenv
+from wled import COLORS, build_state, post_state
 
 load_dotenv()
 
@@ -101,21 +100,32 @@ def get_system_info(target: Optional[str] = None) -> str:
     Returns:
         str: Requested system info
     """
-    info = {}
+    readers = {"battery": battery_info_impl, "wifi": wifi_info_impl}
+    if target:
+        target = target.lower()
+        reader = readers.get(target)
+        return reader() if reader else f"No info available for '{target}'"
+    else:
+        # return all info concatenated if no target specified
+        return " | ".join(read() for read in readers.values())
 
-    # 🔋 Battery Info
+
+def battery_info_impl() -> str:
+    """Battery part of get_system_info (psutil only, no subprocess: cheap enough for the fast path)."""
     try:
         battery = psutil.sensors_battery()
         if battery:
             percent = battery.percent
             charging = "charging ⚡" if battery.power_plugged else "not charging 🔋"
-            info["battery"] = f"Battery: {percent}% ({charging})"
+            return f"Battery: {percent}% ({charging})"
         else:
-            info["battery"] = "Battery: Not detected"
+            return "Battery: Not detected"
     except Exception as e:
-        info["battery"] = f"Battery: Error - {str(e)}"
+        return f"Battery: Error - {str(e)}"
+
 
-    # 📶 Wi-Fi Info
+def wifi_info_impl() -> str:
+    """Wi-Fi part of get_system_info (runs netsh)."""
     try:
         output = subprocess.check_output(
             ["netsh", "wlan", "show", "interfaces"], text=True
@@ -126,18 +136,11 @@ def get_system_info(target: Optional[str] = None) -> str:
                 ssid = line.split(":")[1].strip()
                 break
         if ssid:
-            info["wifi"] = f"Wi-Fi: Connected to {ssid}"
+            return f"Wi-Fi: Connected to {ssid}"
         else:
-            info["wifi"] = "Wi-Fi: Not connected"
+            return "Wi-Fi: Not connected"
     except Exception as e:
-        info["wifi"] = f"Wi-Fi: Error - {str(e)}"
-
-    if target:
-        target = target.lower()
-        return info.get(target, f"No info available for '{target}'")
-    else:
-        # return all info concatenated if no target specified
-        return " | ".join(info.values())
+        return f"Wi-Fi: Error - {str(e)}"
 
 
 def control_wled_impl(
@@ -147,65 +150,18 @@ def control_wled_impl(
     preset: Optional[int] = None
 ) -> str:
     """
-    Control WLED lights at IP 192.168.1.20.
+    Control WLED lights at wled.WLED_HOST (blocking; see wled.WLEDClient for status updates).
     Args:
         power: True (On), False (Off)
         brightness: 0-255
         color: Name (e.g., 'red', 'warm white') or Hex (e.g., '#FF0000')
         preset: ID of the preset to apply
     """
-    ip = "192.168.1.20"
-    url = f"http://{ip}/json/state"
-    
-    # Color mapping
-    COLORS = {
-        "red": [255, 0, 0], "green": [0, 255, 0], "blue": [0, 0, 255],
-        "white": [255, 255, 255], "warm white": [255, 244, 229], 
-        "cool white": [212, 235, 255], "yellow": [255, 255, 0],
-        "cyan": [0, 255, 255], "magenta": [255, 0, 255],
-        "purple": [128, 0, 128], "orange": [255, 165, 0], 
-        "pink": [255, 192, 203]
-    }
-
-    state = {}
-    
-    if power is not None:
-        state["on"] = power
-    
-    if brightness is not None:
-        state["bri"] = max(0, min(255, brightness))
-        
-    if preset is not None:
-        state["ps"] = preset
-        
-    if color:
-        rgb = None
-        color_lower = color.lower().strip()
-        if color_lower in COLORS:
-            rgb = COLORS[color_lower]
-        elif color_lower.startswith("#") and len(color_lower) == 7:
-            try:
-                # Hex to RGB
-                h = color_lower.lstrip('#')
-                rgb = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
-            except:
-                pass
-        
-        if rgb:
-            # Set primary color for all segments
-            state["seg"] = [{"col": [rgb]}]
-    
+    state = build_state(power, brightness, color, preset)
     if not state:
         return "No valid actions provided for WLED."
-
-    try:
-        response = requests.post(url, json=state, timeout=2)
-        if response.status_code == 200:
-            return f"Success: WLED state updated to {json.dumps(state)}"
-        else:
-            return f"Error: WLED returned status {response.status_code}"
-    except Exception as e:
-        return f"Failed to connect to WLED at {ip}: {str(e)}"
+    # Kept-alive connection; returns at once while the strip is known to be unreachable
+    return post_state(state)
 
 @tool
 def control_wled(
@@ -215,7 +171,7 @@ def control_wled(
     preset: Optional[int] = None
 ) -> str:
     """
-    Control WLED lights at IP 192.168.1.20.
+    Control the WLED lights.
     Args:
         power: True (On), False (Off)
         brightness: 0-255
@@ -225,3 +181,6 @@ def control_wled(
     return control_wled_impl(power, brightness, color, preset)
 
 ALL_TOOLS = [play_on_yt, search_tool, window_tool, get_current_date_time, get_system_info, control_wled]
+
+# Tools that change something outside the assistant (only one model may run these per request)
+SIDE_EFFECT_TOOLS = {play_on_yt.name, window_tool.name, control_wled.name}
@@ -1,50 +1,179 @@
 
 import asyncio
-import websockets
+import heapq
+import itertools
+import time
 import numpy as np
 import sounddevice as sd
-from urllib.parse import urlencode
-from collections import deque
+from ring_buffer import AudioRingBuffer, PlaybackRing
+from vibevoice_client import VibeVoiceClient
+from tts_engines import TTSRouter, VibeVoiceEngine, XTTSEngine
+from phrase_cache import PhraseCache
 
 # Constants
 SAMPLE_RATE = 24000
 CHANNELS = 1
 DTYPE = "float32"
+BLOCKSIZE = 512  # Frames per audio callback
 
-# Global buffer for the callback
-audio_buffer = deque()
+# Preallocated PCM16 ring read by the callback (single producer: the event loop)
+PLAYBACK_BUFFER_S = 60
+WRITE_WAIT_S = 0.02  # How often a full ring is re-checked for space
+playback = PlaybackRing(SAMPLE_RATE * PLAYBACK_BUFFER_S)
 _stream = None
 
-def audio_callback(outdata, frames, time, status):
+# Played-through marks: (ring position, seq, future) waiting for the callback to pass them
+_marks = []
+_mark_seq = itertools.count()
+_next_mark = float("inf")  # Smallest pending position, checked by the callback
+_loop = None
+
+# Long-lived websocket pool to the VibeVoice server (no handshake per sentence)
+client = VibeVoiceClient()
+
+# VibeVoice first; in-process XTTS takes over when the server is down or slow to start
+USE_XTTS_FALLBACK = True
+router = TTSRouter([VibeVoiceEngine(client)] + ([XTTSEngine()] if USE_XTTS_FALLBACK else []))
+
+# Phrases Nova repeats ("On it", fallbacks, confirmations) are played from here instead of re-synthesized
+cache = PhraseCache()
+
+# Copy of everything sent to the speaker, resampled to the mic rate (16 kHz).
+# Barge-in uses it as the echo reference. Silence is written too, so positions
+# in this ring advance in lockstep with the microphone ring.
+REFERENCE_RATE = 16000
+REF_TABLES_MAX = 32  # Cached (block size, phase) pairs; 24 -> 16 kHz with a fixed block size needs 3
+reference = AudioRingBuffer(REFERENCE_RATE * 30, dtype=np.float32)
+_ref_step = SAMPLE_RATE / REFERENCE_RATE
+_ref_phase = 0.0
+_ref_taps = {}  # (block size, phase) -> (left index, right index, weight) per output sample
+_ref_a = np.empty(0, dtype=np.float32)  # Scratch for the callback, grown with the taps
+_ref_b = np.empty(0, dtype=np.float32)
+_ref_src = np.zeros(1, dtype=np.float32)  # Last sample of the previous block, then the current block
+
+def _reference_taps(n, phase):
+    """
+    Linear interpolation taps for one block of n samples starting at phase (computed once).
+    Indices are into the block with the previous block's last sample in front (n + 1 long),
+    so the taps near the end of a block never need a sample the next block hasn't delivered.
+    """
+    global _ref_a, _ref_b, _ref_src
+    taps = _ref_taps.get((n, phase))
+    if taps is None:
+        if len(_ref_taps) >= REF_TABLES_MAX:
+            _ref_taps.clear()
+        x = np.arange(phase, n, _ref_step)
+        left = x.astype(np.intp)
+        taps = (left, left + 1, (x - left).astype(np.float32))
+        _ref_taps[(n, phase)] = taps
+        if len(x) > len(_ref_a):
+            _ref_a, _ref_b = np.empty_like(taps[2]), np.empty_like(taps[2])
+        if n + 1 > len(_ref_src):
+            src = np.zeros(n + 1, dtype=np.float32)
+            src[0] = _ref_src[0]
+            _ref_src = src
+    return taps
+
+def _prepare_reference_taps(n=BLOCKSIZE):
+    """Computes the taps for every phase a stream of n-sample callbacks goes through, ahead of time."""
+    phase = 0.0
+    while (n, phase) not in _ref_taps and len(_ref_taps) < REF_TABLES_MAX:
+        phase += len(_reference_taps(n, phase)[0]) * _ref_step - n
+
+def _write_reference(samples):
+    """
+    Decimates one callback's worth of output to 16 kHz into the reference ring. Taps and
+    scratch are reused across callbacks, so this neither allocates nor takes a lock.
+    One sample of history is kept between calls so interpolation runs across block
+    boundaries (the reference lags the speaker by that one 24 kHz sample).
+    """
+    global _ref_phase
+    n = len(samples)
+    left, right, weight = _reference_taps(n, _ref_phase)
+    m = len(left)
+    a, b = _ref_a[:m], _ref_b[:m]
+    src = _ref_src[:n + 1]
+    src[1:] = samples
+    np.take(src, left, out=a)
+    np.take(src, right, out=b)
+    src[0] = src[n]
+    np.subtract(b, a, out=b)
+    np.multiply(b, weight, out=b)
+    np.add(a, b, out=a)
+    reference.write(a, notify=False)  # Barge-in polls the reference ring; it never waits on it
+    _ref_phase += m * _ref_step - n
+
+def audio_callback(outdata, frames, time_info, status):
+    global _next_mark
     if status:
         print("Audio status:", status)
 
-    samples_needed = frames
-    outdata.fill(0)
-
-    while samples_needed > 0 and audio_buffer:
-        chunk = audio_buffer[0]
-
-        take = min(len(chunk), samples_needed)
-        outdata[frames - samples_needed : frames - samples_needed + take, 0] = chunk[:take]
+    # One vectorized int16 -> float32 copy out of the ring, zero-padded if it runs dry
+    n = playback.read_into(outdata[:, 0])
+    _write_reference(outdata[:, 0])
 
-        if take < len(chunk):
-            audio_buffer[0] = chunk[take:]
-        else:
-            audio_buffer.popleft()
+    end = playback.read_pos
+    if end >= _next_mark:
+        # Hand over to the event loop once per crossing; it resolves the marks
+        _next_mark = float("inf")
+        latency = time_info.outputBufferDacTime - time_info.currentTime
+        _loop.call_soon_threadsafe(_marks_reached, end, end - n, latency)
 
-        samples_needed -= take
+def _marks_reached(end, buffer_start, latency):
+    """
+    Event loop side of the callback: every mark up to end is in the buffer that was
+    just handed to the device, and becomes audible latency seconds (plus its offset
+    within that buffer) later.
+    """
+    global _next_mark
+    if latency <= 0:
+        latency = output_latency()  # Some host APIs don't report DAC times
+    while _marks and _marks[0][0] <= end:
+        pos, _, fut = heapq.heappop(_marks)
+        delay = latency + max(0, pos - buffer_start) / SAMPLE_RATE
+        _loop.call_later(delay, _resolve, fut)
+    _next_mark = _marks[0][0] if _marks else float("inf")
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(time.time())
+
+def mark():
+    """Ring position just after everything queued so far."""
+    return playback.write_pos
+
+async def played_through(pos=None):
+    """
+    Waits until sample pos (default: everything queued so far) has left the speaker,
+    by sample count plus the device's output latency. Returns the wall-clock time it
+    became audible. Flushed audio counts as played.
+    """
+    global _loop, _next_mark
+    if pos is None:
+        pos = mark()
+    if _stream is None:
+        return time.time()
+    if playback.read_pos >= pos:
+        # Already handed to the device, at most one output latency ago
+        await asyncio.sleep(output_latency())
+        return time.time()
+    _loop = asyncio.get_running_loop()
+    fut = _loop.create_future()
+    heapq.heappush(_marks, (pos, next(_mark_seq), fut))
+    _next_mark = min(_next_mark, pos)
+    return await fut
 
 def start_stream():
     """Starts a persistent audio stream."""
     global _stream
     if _stream is None:
+        _prepare_reference_taps()
         _stream = sd.OutputStream(
             samplerate=SAMPLE_RATE,
             channels=CHANNELS,
             dtype=DTYPE,
             callback=audio_callback,
-            blocksize=512,
+            blocksize=BLOCKSIZE,
         )
         _stream.start()
         print("🔈 Audio stream started")
@@ -56,43 +185,89 @@ def stop_stream():
         _stream.stop()
         _stream.close()
         _stream = None
-        audio_buffer.clear()
+        playback.reset()
+        # Nothing will play any more: release everyone waiting
+        while _marks:
+            _resolve(heapq.heappop(_marks)[2])
         print("🔇 Audio stream stopped")
 
+def flush():
+    """Drops everything queued for playback (used when the user barges in)."""
+    playback.flush()
+
+def output_latency():
+    """Output latency of the playback stream in seconds (0 if not running)."""
+    return _stream.latency if _stream is not None else 0.0
+
 async def wait_until_done():
-    """Waits until the audio buffer is completely empty and played."""
-    while audio_buffer:
-        await asyncio.sleep(0.05)
-    # Small extra wait to ensure the last burst is physically played by hardware
-    await asyncio.sleep(0.2)
+    """Waits until the last queued sample has been played by the hardware."""
+    await played_through()
 
-async def ws_receiver(text, voice):
-    params = {
-        "text": text,
-        "voice": voice,
-        "cfg": 1.5,
-        "steps": 5,
-    }
-    WS_URL = f"ws://localhost:3000/stream?{urlencode(params)}"
+async def enqueue(samples):
+    """Queues int16 samples for playback, waiting while the ring is full."""
+    written = playback.write(samples)
+    while written < len(samples):
+        await asyncio.sleep(WRITE_WAIT_S)
+        written += playback.write(samples[written:])
+
+def _to_pcm(msg):
+    # Zero-copy int16 view of the PCM16 payload; the ring does the only copy
+    return np.frombuffer(msg, dtype=np.int16)
 
+async def synthesize(text, voice):
+    """
+    Async iterator of int16 chunks for one sentence.
+    Cached phrases come back whole and immediately; others stream from the engine
+    the router picks, and are cached once received completely if the cache admits them.
+    """
+    engines = router.engines
+    if not cache.has(text, *engines[0].cache_key(voice)):
+        # The preferred engine has no copy; any engine's cached copy beats synthesizing
+        engines = [e for e in engines if cache.has(text, *e.cache_key(voice))] or engines[:1]
+    pcm = cache.get(text, *engines[0].cache_key(voice))
+    if pcm is not None:
+        yield _to_pcm(pcm)
+        return
+
+    parts = [] if cache.admit(text) else None
+    route = {}  # Per sentence: look-ahead syntheses may be routed to different engines
+    async for msg in router.stream(text, voice, route):
+        if parts is not None:
+            parts.append(msg)
+        yield _to_pcm(msg)
+    # Audio spliced from two engines mid-sentence is played once, never cached
+    if parts and not route["spliced"]:
+        engine = next(e for e in router.engines if e.name == route["engine"])
+        cache.put(text, *engine.cache_key(voice), b"".join(parts))
+
+async def prewarm(phrases, voice):
+    """Connects / loads the TTS engines, then synthesizes any of phrases not cached yet."""
+    cache.register(phrases)
+    print(f"🔊 TTS engines: {await router.warm()}")
+    for text in phrases:
+        if cache.has(text, *router.engines[0].cache_key(voice)):
+            continue
+        try:
+            async for _ in synthesize(text, voice):
+                pass
+        except Exception as e:
+            print(f"⚠️ Could not pre-warm '{text}': {e}")
+            return
+    print(f"🗃️ TTS cache: {cache.stats()}")
+
+async def ws_receiver(text, voice):
+    """Streams one sentence from the best available TTS engine into the playback ring."""
     try:
-        async with websockets.connect(WS_URL, max_size=None) as ws:
-            async for msg in ws:
-                if isinstance(msg, bytes):
-                    # PCM16 → float32
-                    samples = (
-                        np.frombuffer(msg, dtype=np.int16)
-                        .astype(np.float32) / 32768.0
-                    )
-                    audio_buffer.append(samples)
+        async for samples in synthesize(text, voice):
+            await enqueue(samples)
     except Exception as e:
-        print(f"WebSocket Error: {e}")
+        print(f"TTS Error: {e}")
 
 
 async def speak_async(text: str, voice: str = 'en-Mike_man'):
     """
     Asynchronous version of speak.
-    Appends to the global buffer while the persistent stream plays it.
+    Writes into the playback ring while the persistent stream plays it.
     """
     if not text.strip():
         return
@@ -111,11 +286,18 @@ def speak(text: str, voice: str = 'en-Mike_man'):
     if not text.strip():
         return
         
+    async def speak_once():
+        try:
+            await speak_async(text, voice)
+            await wait_until_done()
+        finally:
+            # Pooled sockets belong to this event loop, which asyncio.run is about to close
+            await router.close()
+
     try:
         # For synchronous usage, we start/stop manually
         start_stream()
-        asyncio.run(speak_async(text, voice))
-        asyncio.run(wait_until_done())
+        asyncio.run(speak_once())
         stop_stream()
     except Exception as e:
         print(f"TTS Error: {e}")
@@ -0,0 +1,301 @@
+import time
+import asyncio
+import threading
+import numpy as np
+from vibevoice_client import CFG, STEPS
+
+# Configuration
+SAMPLE_RATE = 24000  # Every engine delivers PCM16 mono at this rate
+
+# XTTS v2 (Coqui), in-process
+XTTS_MODEL = "tts_models/multilingual/multi-dataset/xtts_v2"
+XTTS_SPEAKER = "Luis Moray"  # Built-in XTTS speaker (VibeVoice voice names don't exist there)
+XTTS_LANGUAGE = "en"
+XTTS_STREAM_CHUNK = 20  # GPT tokens per streamed chunk: smaller = earlier first audio, more overhead
+XTTS_CPU_THREADS = 0  # torch threads on CPU (0 = torch default)
+XTTS_PRELOAD = False  # Load at startup (a few GB of RAM/VRAM) instead of on the first failover
+
+# Router
+FIRST_AUDIO_TIMEOUT_S = 4.0  # No audio by then counts as a failure (covers a dead server)
+TTFA_ALPHA = 0.3  # EWMA weight of a new time-to-first-audio sample
+DOWN_START_S = 5.0  # How long a failed engine is skipped, doubling per failure...
+DOWN_MAX_S = 120.0  # ...up to this
+FAILOVER_FADE_S = 0.02  # A sentence cut off mid-way fades out over this (no click)...
+FAILOVER_PAUSE_S = 0.25  # ...and restarts on the next engine after this pause
+
+_STARTED = object()  # XTTS worker -> stream: the model is loaded and inference has begun
+
+
+class TTSEngine:
+    """
+    Interface of a TTS engine: stream(text, voice) is an async iterator of PCM16
+    bytes at SAMPLE_RATE. cache_key(voice) gives the (voice, cfg, steps) part of the
+    phrase cache key, so cached audio is never mixed up between engines.
+    """
+
+    name = "engine"
+    first_audio_timeout_s = FIRST_AUDIO_TIMEOUT_S
+
+    def cache_key(self, voice):
+        return (f"{self.name}:{voice}", None, None)
+
+    async def stream(self, text, voice):
+        raise NotImplementedError
+
+    async def warm(self):
+        """Loads / connects ahead of time. Returns True if the engine is usable."""
+        return True
+
+    async def close(self):
+        pass
+
+
+class VibeVoiceEngine(TTSEngine):
+    """The VibeVoice server, over the pooled websocket client."""
+
+    name = "vibevoice"
+
+    def __init__(self, client, cfg=CFG, steps=STEPS):
+        self.client = client
+        self.cfg = cfg
+        self.steps = steps
+
+    def cache_key(self, voice):
+        # Same key as before engines existed, so the on-disk cache stays valid
+        return (voice, self.cfg, self.steps)
+
+    async def stream(self, text, voice):
+        async for pcm in self.client.stream(text, voice, self.cfg, self.steps):
+            yield pcm
+
+    async def warm(self):
+        try:
+            await self.client.ping()  # False only means no /session endpoint: /stream still works
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        await self.client.close()
+
+
+class XTTSEngine(TTSEngine):
+    """
+    Coqui XTTS v2 running in this process, on CUDA if available and CPU otherwise.
+    The model is loaded once and kept; sentences are synthesized with
+    inference_stream in a worker thread, so audio chunks reach the playback ring
+    while the rest of the sentence is still being generated.
+    """
+
+    name = "xtts"
+
+    def __init__(self, speaker=XTTS_SPEAKER, language=XTTS_LANGUAGE):
+        self.speaker = speaker
+        self.language = language
+        self.available = True  # False once the TTS package / model turned out to be missing
+        self._model = None
+        self._latents = None
+        self._load_lock = threading.Lock()
+        self._infer_lock = threading.Lock()  # One synthesis at a time on the shared model
+
+    def cache_key(self, voice):
+        return (f"xtts:{self.speaker}", None, None)
+
+    # Not timed by the router: loading the model and waiting for another sentence to
+    # release it don't count. stream() times the first audio from when inference starts.
+    first_audio_timeout_s = None
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is not None:
+                return
+            import torch
+            from TTS.api import TTS
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            if device == "cpu" and XTTS_CPU_THREADS:
+                torch.set_num_threads(XTTS_CPU_THREADS)
+            start = time.perf_counter()
+            model = TTS(XTTS_MODEL).to(device).synthesizer.tts_model
+            speaker = model.speaker_manager.speakers[self.speaker]
+            self._latents = (speaker["gpt_cond_latent"], speaker["speaker_embedding"])
+            self._model = model
+            print(f"✅ XTTS loaded on {device} in {time.perf_counter() - start:.1f}s")
+
+    async def warm(self):
+        if not self.available:
+            return False
+        if not XTTS_PRELOAD:
+            return True
+        try:
+            await asyncio.to_thread(self._load)
+            return True
+        except ImportError as e:
+            print(f"ℹ️ XTTS unavailable ({e}); install the 'coqui-tts' package to enable it")
+            self.available = False
+            return False
+
+    def _run(self, text, loop, queue, cancelled):
+        """Worker thread: streams chunks into the asyncio queue (None = end, exception = failure)."""
+        try:
+            self._load()
+            gpt_cond_latent, speaker_embedding = self._latents
+            with self._infer_lock:
+                loop.call_soon_threadsafe(queue.put_nowait, _STARTED)
+                for chunk in self._model.inference_stream(
+                    text, self.language, gpt_cond_latent, speaker_embedding,
+                    stream_chunk_size=XTTS_STREAM_CHUNK,
+                ):
+                    if cancelled.is_set():
+                        break
+                    wav = chunk.squeeze().cpu().numpy()
+                    pcm = (np.clip(wav, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+                    loop.call_soon_threadsafe(queue.put_nowait, pcm)
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+        except BaseException as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    async def stream(self, text, voice):
+        if not self.available:
+            raise ConnectionError("XTTS is not installed")
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+        threading.Thread(target=self._run, args=(text, loop, queue, cancelled), daemon=True).start()
+        timeout = None
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout)
+                timeout = None
+                if item is _STARTED:
+                    timeout = FIRST_AUDIO_TIMEOUT_S
+                    continue
+                if item is None:
+                    return
+                if isinstance(item, BaseException):
+                    if isinstance(item, ImportError):
+                        self.available = False
+                    raise ConnectionError(f"XTTS failed: {item}")
+                yield item
+        finally:
+            cancelled.set()  # Stops generation if the sentence was abandoned (barge-in)
+
+
+def _fade_out(last, rate=SAMPLE_RATE):
+    """PCM16 ramp from sample value last down to silence, then a short pause."""
+    ramp = np.linspace(last, 0, int(FAILOVER_FADE_S * rate), endpoint=False)
+    pause = np.zeros(int(FAILOVER_PAUSE_S * rate))
+    return np.concatenate([ramp, pause]).astype(np.int16).tobytes()
+
+
+class _EngineState:
+    def __init__(self, engine):
+        self.engine = engine
+        self.ttfa_s = None  # EWMA of observed time to first audio
+        self.failures = 0
+        self.down_until = 0.0
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def succeeded(self, ttfa_s):
+        self.failures = 0
+        self.ttfa_s = ttfa_s if self.ttfa_s is None else self.ttfa_s + TTFA_ALPHA * (ttfa_s - self.ttfa_s)
+
+    def failed(self):
+        self.failures += 1
+        down = min(DOWN_START_S * 2 ** (self.failures - 1), DOWN_MAX_S)
+        self.down_until = time.monotonic() + down
+        return down
+
+
+class TTSRouter:
+    """
+    Picks a TTS engine per sentence by health and observed time to first audio.
+    Engines that fail (error, or no audio within FIRST_AUDIO_TIMEOUT_S) are skipped
+    for a backoff period and the sentence is re-synthesized on the next one, so a
+    dead server costs at most one timeout and never a dropped sentence. A sentence
+    cut off mid-way is faded out and restarted from its beginning (engines differ in
+    voice and pacing, so there is no matching point to resume from). Engines
+    without a measurement yet rank after measured ones, in their configured order.
+    """
+
+    def __init__(self, engines):
+        self.states = [_EngineState(e) for e in engines]
+
+    def order(self):
+        """Engines to try, best first: healthy ones by TTFA, then the ones in backoff."""
+        ranked = sorted(
+            enumerate(self.states),
+            key=lambda item: (
+                not item[1].healthy,
+                item[1].ttfa_s if item[1].ttfa_s is not None else float("inf"),
+                item[0],
+            ),
+        )
+        return [state for _, state in ranked]
+
+    @property
+    def engines(self):
+        return [state.engine for state in self.order()]
+
+    async def stream(self, text, voice, route=None):
+        """
+        Async iterator of PCM16 bytes for one sentence, failing over between engines.
+        If route (a dict) is given, route["engine"] is set to the name of the engine the
+        audio comes from, and route["spliced"] to True if the sentence was restarted.
+        """
+        route = {} if route is None else route
+        last_error = None
+        for state in self.order():
+            engine = state.engine
+            start = time.monotonic()
+            received = False
+            last = None  # Last sample this engine played, for the fade-out if it fails
+            chunks = engine.stream(text, voice)
+            try:
+                pcm = await asyncio.wait_for(chunks.__anext__(), engine.first_audio_timeout_s)
+                state.succeeded(time.monotonic() - start)
+                received = True
+                route["spliced"] = "engine" in route
+                route["engine"] = engine.name
+                while True:
+                    if len(pcm) >= 2:
+                        last = int(np.frombuffer(pcm, dtype=np.int16, offset=len(pcm) - 2)[0])
+                    yield pcm
+                    pcm = await chunks.__anext__()
+            except StopAsyncIteration:
+                return  # End of the sentence (or nothing to say, e.g. only punctuation)
+            except Exception as e:
+                last_error = e
+                down = state.failed()
+                where = "mid-sentence" if received else "before first audio"
+                reason = "no audio in time" if isinstance(e, asyncio.TimeoutError) else e
+                print(f"⚠️ TTS engine '{engine.name}' failed {where} ({reason}); skipping it for {down:.0f}s")
+            finally:
+                await chunks.aclose()
+            if last is not None:
+                # The next engine speaks with another voice and pace, so its audio can't be
+                # joined mid-word: the cut-off sentence fades out and restarts from the top
+                yield _fade_out(last)
+
+        raise ConnectionError(f"All TTS engines failed: {last_error}")
+
+    async def warm(self):
+        """Connects / loads every engine concurrently; unhealthy ones start in backoff."""
+        results = await asyncio.gather(*(s.engine.warm() for s in self.states), return_exceptions=True)
+        for state, ok in zip(self.states, results):
+            if ok is not True:
+                state.failed()
+        return {s.engine.name: ok is True for s, ok in zip(self.states, results)}
+
+    def stats(self):
+        return {
+            s.engine.name: {"ttfa_s": s.ttfa_s, "healthy": s.healthy, "failures": s.failures}
+            for s in self.states
+        }
+
+    async def close(self):
+        for state in self.states:
+            await state.engine.close()
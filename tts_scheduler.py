@@ -0,0 +1,175 @@
+import time
+import asyncio
+from collections import deque
+import tts
+from jitter_buffer import JitterBuffer
+
+# Constants
+LOOKAHEAD_DEPTH = 2  # Sentences being synthesized at once (the playing one included)
+MAX_BUFFERED_S = 30  # Cap on audio held for sentences that are not playing yet
+MAX_BUFFERED_SAMPLES = int(MAX_BUFFERED_S * tts.SAMPLE_RATE)
+
+# Production-rate estimates carry over between answers
+jitter = JitterBuffer(tts.SAMPLE_RATE)
+
+
+def _print_speaking(text, audible_at):
+    print(f"\n🎙️ Speaking: {text}")
+
+
+class _Sentence:
+    def __init__(self, text):
+        self.text = text
+        self.chunks = deque()
+        self.buffered = 0  # Samples collected while waiting behind other sentences
+        self.received = 0
+        self.enqueued = 0
+        self.first_at = None  # Arrival of the first chunk (monotonic)
+        self.first_len = 0
+        self.throttled = False  # Synthesis was paused by the memory cap: its rate means nothing
+        self.done = False
+        self.changed = asyncio.Event()
+        self.audible = None  # Task -> wall time the first sample left the speaker
+        self.played = None  # Task -> wall time the last sample left the speaker
+
+
+class SpeechScheduler:
+    """
+    Synthesizes up to LOOKAHEAD_DEPTH sentences concurrently and splices their audio
+    into the playback buffer strictly in order.
+    The sentence at the head streams straight to the speaker as it arrives; the ones
+    behind it buffer their PCM separately until it is their turn, so synthesis of the
+    next sentence always overlaps playback of the current one. Buffered audio is
+    capped at MAX_BUFFERED_SAMPLES; past that, look-ahead synthesis pauses.
+    on_audible(text, wall_time) is called when each sentence actually starts playing.
+    An armed acknowledge.Acknowledger (ack) hands over to the first chunk of the answer.
+    """
+
+    def __init__(self, voice, depth=LOOKAHEAD_DEPTH, max_buffered=MAX_BUFFERED_SAMPLES, on_audible=None,
+                 jitter=jitter, ack=None):
+        self.voice = voice
+        self.ack = ack
+        self.jitter = jitter
+        self.on_audible = on_audible or _print_speaking
+        self.sentences = []  # This answer's sentences, in order, with their audible/played tasks
+        self.depth = depth
+        self.max_buffered = max_buffered
+        self.buffered = 0
+        self.head = None
+        self._space = asyncio.Condition()
+
+    async def _synthesize(self, sentence, slots):
+        """Collects one sentence's audio, waiting for room if it is not at the head."""
+        try:
+            async for samples in tts.synthesize(sentence.text, self.voice):
+                if sentence.first_at is None:
+                    sentence.first_at = time.monotonic()
+                    sentence.first_len = len(samples)
+                sentence.received += len(samples)
+                if sentence is not self.head:
+                    if self.buffered >= self.max_buffered:
+                        sentence.throttled = True
+                    async with self._space:
+                        await self._space.wait_for(
+                            lambda: sentence is self.head or self.buffered < self.max_buffered
+                        )
+                    if sentence is not self.head:
+                        sentence.buffered += len(samples)
+                        self.buffered += len(samples)
+                sentence.chunks.append(samples)
+                sentence.changed.set()
+            self.jitter.finished(sentence.text, sentence.received, sentence.first_at, sentence.first_len,
+                                 time.monotonic(), reliable=not sentence.throttled)
+        except Exception as e:
+            print(f"TTS Error: {e}")
+        finally:
+            sentence.done = True
+            sentence.changed.set()
+            slots.release()
+
+    def _audible(self, text, task):
+        if not task.cancelled():
+            self.on_audible(text, task.result())
+
+    def _ready(self, sentence):
+        """Jitter buffer: hold the head sentence until it can play through without running dry."""
+        queued = tts.playback.available() + sentence.received - sentence.enqueued
+        return self.jitter.ready(sentence.text, sentence.received, sentence.first_at, sentence.first_len,
+                                 queued, sentence.done)
+
+    async def _splice(self, order):
+        """Moves each sentence's audio into the playback buffer, in order."""
+        while True:
+            sentence = await order.get()
+            if sentence is None:
+                return
+            self.head = sentence
+            # Its look-ahead audio goes to the speaker now, which frees room for the others
+            self.buffered -= sentence.buffered
+            sentence.buffered = 0
+            async with self._space:
+                self._space.notify_all()
+
+            head_at = time.monotonic()
+            released = False
+            while True:
+                if not released:
+                    released = self._ready(sentence)
+                    if released and sentence.received:
+                        self.jitter.record_delay(max(0.0, time.monotonic() - max(head_at, sentence.first_at)))
+                if released:
+                    while sentence.chunks:
+                        samples = sentence.chunks.popleft()
+                        if self.ack is not None and not self.ack.answered:
+                            samples = self.ack.take_over(samples)
+                        if sentence.audible is None:
+                            sentence.audible = asyncio.create_task(tts.played_through(tts.mark() + 1))
+                            sentence.audible.add_done_callback(
+                                lambda task, text=sentence.text: self._audible(text, task)
+                            )
+                        await tts.enqueue(samples)
+                        sentence.enqueued += len(samples)
+                    if sentence.done:
+                        break
+                sentence.changed.clear()
+                await sentence.changed.wait()
+            sentence.played = asyncio.create_task(tts.played_through(tts.mark()))
+
+    async def play(self, sentences):
+        """Speaks every sentence from the async iterator sentences, gaplessly and in order."""
+        if tts._stream is None:
+            tts.start_stream()
+
+        self.buffered = 0
+        self.head = None
+        self.sentences = []
+        order = asyncio.Queue()
+        slots = asyncio.Semaphore(self.depth)
+        splicer = asyncio.create_task(self._splice(order))
+        workers = []
+        tts.playback.streaming = True  # Running dry from here on counts as an underrun
+        underruns = tts.playback.underruns  # The ring's counter covers the whole session
+        try:
+            async for text in sentences:
+                await slots.acquire()
+                sentence = _Sentence(text)
+                self.sentences.append(sentence)
+                workers.append(asyncio.create_task(self._synthesize(sentence, slots)))
+                await order.put(sentence)
+            await order.put(None)
+            await splicer
+            print(f"📶 TTS: {self.jitter.stats(tts.playback.underruns - underruns)}")
+        except BaseException:
+            # Cut short (barge-in): flushed sentences were never heard
+            for sentence in self.sentences:
+                for task in (sentence.audible, sentence.played):
+                    if task is not None and not task.done():
+                        task.cancel()
+            raise
+        finally:
+            if self.ack is not None:
+                self.ack.cancel()
+            tts.playback.streaming = False
+            splicer.cancel()
+            for worker in workers:
+                worker.cancel()
@@ -0,0 +1,226 @@
+import json
+import struct
+import asyncio
+import itertools
+import websockets
+from urllib.parse import urlencode
+
+# Constants
+HOST = "localhost:3000"
+STREAM_URL = f"ws://{HOST}/stream"  # One-shot: text in the query string, one connection per sentence
+SESSION_URL = f"ws://{HOST}/session"  # Persistent: many requests multiplexed by utterance id
+CFG = 1.5
+STEPS = 5
+
+POOL_SIZE = 2  # Persistent connections kept open
+CONNECT_TIMEOUT_S = 3
+CONNECT_ATTEMPTS = 3  # Per request, before giving up on the sentence
+BACKOFF_START_S = 0.5
+BACKOFF_MAX_S = 10
+PING_INTERVAL_S = 15  # Health check
+PING_TIMEOUT_S = 5
+
+# Session protocol (client -> server, text):  {"id": 7, "text": "...", "voice": "...", "cfg": 1.5, "steps": 5}
+#                                       or {"id": 7, "type": "cancel"}
+# Session protocol (server -> client):  binary = 4-byte little-endian id + PCM16 payload,
+#                                       text = {"id": 7, "type": "end"} or {"id": 7, "type": "error", "message": "..."}
+_HEADER = struct.Struct("<I")
+
+
+class SessionUnsupported(Exception):
+    """The server has no /session endpoint (e.g. the stock VibeVoice demo)."""
+
+
+class _Connection:
+    """One persistent websocket, multiplexing utterances by id."""
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+        self.streams = {}  # utterance id -> asyncio.Queue of PCM bytes (None = end)
+        self._reader = None
+        self._pinger = None
+        self._backoff = BACKOFF_START_S
+        self._lock = asyncio.Lock()
+        self.healthy = False
+        self.last_ping_s = None
+
+    @property
+    def busy(self):
+        return len(self.streams)
+
+    async def ensure_open(self):
+        """Connects (or reconnects with exponential backoff) if needed."""
+        async with self._lock:
+            attempts = 0
+            while self.ws is None:
+                try:
+                    self.ws = await asyncio.wait_for(
+                        websockets.connect(self.url, max_size=None, ping_interval=None),
+                        CONNECT_TIMEOUT_S,
+                    )
+                except websockets.exceptions.InvalidHandshake as e:
+                    raise SessionUnsupported(str(e))
+                except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                    attempts += 1
+                    if attempts >= CONNECT_ATTEMPTS:
+                        raise ConnectionError(f"TTS server unreachable: {e}")
+                    print(f"🔌 TTS connection failed ({e}), retrying in {self._backoff:.1f}s")
+                    await asyncio.sleep(self._backoff)
+                    self._backoff = min(self._backoff * 2, BACKOFF_MAX_S)
+                    continue
+                self._backoff = BACKOFF_START_S
+                self.healthy = True
+                self._reader = asyncio.create_task(self._read_loop(self.ws))
+                self._pinger = asyncio.create_task(self._ping_loop(self.ws))
+
+    async def _read_loop(self, ws):
+        try:
+            async for msg in ws:
+                if isinstance(msg, bytes):
+                    (uid,) = _HEADER.unpack_from(msg)
+                    queue = self.streams.get(uid)
+                    if queue is not None:
+                        queue.put_nowait(msg[_HEADER.size:])
+                else:
+                    event = json.loads(msg)
+                    queue = self.streams.get(event.get("id"))
+                    if queue is None:
+                        continue
+                    if event.get("type") == "error":
+                        print(f"TTS server error: {event.get('message')}")
+                    if event.get("type") in ("end", "error"):
+                        queue.put_nowait(None)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self._drop(ws)
+
+    async def _ping_loop(self, ws):
+        """Health check: a ping every PING_INTERVAL_S; a missed pong drops the connection."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await asyncio.sleep(PING_INTERVAL_S)
+                start = loop.time()
+                pong = await ws.ping()
+                await asyncio.wait_for(pong, PING_TIMEOUT_S)
+                self.last_ping_s = loop.time() - start
+        except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+            print("🔌 TTS connection unhealthy, reconnecting on next request")
+            await ws.close()
+
+    def _drop(self, ws):
+        """Forgets a dead socket and ends every utterance still waiting on it."""
+        if ws is None or self.ws is not ws:
+            return
+        self.ws = None
+        self.healthy = False
+        if self._pinger is not None:
+            self._pinger.cancel()
+        for queue in self.streams.values():
+            queue.put_nowait(ConnectionError)
+        self.streams.clear()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+
+class VibeVoiceClient:
+    """
+    Pool of long-lived websockets to the VibeVoice server.
+    Each sentence is sent as a request with its own utterance id over an already open
+    connection, so there is no TCP/websocket handshake per sentence. Dropped connections
+    are reopened with backoff, and a request that had not received any audio yet is
+    retried on the new connection. If the server only has the one-shot /stream
+    endpoint, the client falls back to one connection per sentence.
+    """
+
+    def __init__(self, session_url=SESSION_URL, stream_url=STREAM_URL, pool_size=POOL_SIZE):
+        self.stream_url = stream_url
+        self.pool = [_Connection(session_url) for _ in range(pool_size)]
+        self.session_supported = True
+        self._ids = itertools.count(1)
+
+    def _pick(self):
+        """Least busy connection, preferring ones that are already open."""
+        return min(self.pool, key=lambda c: (c.ws is None, c.busy))
+
+    async def stream(self, text, voice, cfg=CFG, steps=STEPS):
+        """Async iterator of raw PCM16 chunks for one utterance."""
+        if self.session_supported:
+            try:
+                async for pcm in self._session_stream(text, voice, cfg, steps):
+                    yield pcm
+                return
+            except SessionUnsupported:
+                print("ℹ️ TTS server has no /session endpoint, using one connection per sentence")
+                self.session_supported = False
+
+        async for pcm in self._oneshot_stream(text, voice, cfg, steps):
+            yield pcm
+
+    async def _session_stream(self, text, voice, cfg, steps):
+        received = False
+        for attempt in range(2):
+            conn = self._pick()
+            await conn.ensure_open()
+            ws = conn.ws
+            uid = next(self._ids)
+            queue = asyncio.Queue()
+            conn.streams[uid] = queue
+            finished = False
+            try:
+                await ws.send(json.dumps(
+                    {"id": uid, "text": text, "voice": voice, "cfg": cfg, "steps": steps}
+                ))
+                while True:
+                    pcm = await queue.get()
+                    if pcm is None:
+                        finished = True
+                        return
+                    if pcm is ConnectionError:
+                        raise ConnectionError("TTS connection dropped")
+                    received = True
+                    yield pcm
+            except (ConnectionError, websockets.exceptions.ConnectionClosed):
+                finished = True
+                conn._drop(ws)
+                if received or attempt:
+                    raise  # Can't resume half a sentence
+                # Nothing played yet: transparently retry on a fresh connection
+            finally:
+                conn.streams.pop(uid, None)
+                if not finished and conn.ws is ws:
+                    # Abandoned mid-sentence (e.g. barge-in): tell the server to stop
+                    asyncio.ensure_future(self._cancel(ws, uid))
+
+    async def _cancel(self, ws, uid):
+        try:
+            await ws.send(json.dumps({"id": uid, "type": "cancel"}))
+        except Exception:
+            pass
+
+    async def _oneshot_stream(self, text, voice, cfg, steps):
+        params = {"text": text, "voice": voice, "cfg": cfg, "steps": steps}
+        async with websockets.connect(f"{self.stream_url}?{urlencode(params)}", max_size=None) as ws:
+            async for msg in ws:
+                if isinstance(msg, bytes):
+                    yield msg
+
+    async def ping(self):
+        """Opens the pool (if needed) and returns True if every connection is healthy."""
+        if not self.session_supported:
+            return False
+        try:
+            for conn in self.pool:
+                await conn.ensure_open()
+        except SessionUnsupported:
+            self.session_supported = False
+            return False
+        return all(conn.healthy for conn in self.pool)
+
+    async def close(self):
+        for conn in self.pool:
+            await conn.close()
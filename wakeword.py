@@ -1,56 +1,115 @@
-import openwakeword
-from openwakeword.model import Model
-import pyaudio
-import numpy as np
 import logging
+import audio_capture
+import wakeword_engine
+import wakeword_verifier
+from wakeword_engine import THRESHOLD
 
 # Suppress warnings
 logging.getLogger('openwakeword').setLevel(logging.ERROR)
 
 # Configuration
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-RATE = 16000
-CHUNK = 1280
-THRESHOLD = 0.5
+RATE = audio_capture.RATE
+# Run detection in its own process (fed from the shared-memory mic ring) so ONNX
+# inference can't starve the playback callback of the GIL, or vice versa
+USE_WORKER_PROCESS = True
+ONNX_THREADS = wakeword_engine.ONNX_THREADS
+# Optional second stage before a turn is started: None, "smoothed" or "whisper".
+# With a verifier, THRESHOLD can be lowered so the first stage stays cheap and permissive;
+# measure both stages with `python wakeword_verifier.py <labelled_dir>`.
+VERIFIER = None
+LOG_SCORES = True  # Append every detection (both stages) to wakeword_verifier.SCORE_LOG
 
-print("⏳ Loading Wake Word Model...")
-# Load the model (downloads automatically if not present)
-model = Model(wakeword_models=["hey_mycroft"], inference_framework="onnx")
-print("✅ Wake Word Model Loaded")
+model = None
+worker = None
+_worker_stats = {}  # Final gate statistics of a stopped worker
+verifier = wakeword_verifier.make_verifier(VERIFIER)
+gate = wakeword_engine.EnergyGate(RATE) if wakeword_engine.GATE_ENABLED else None  # In-process mode only
+
+# Absolute capture position (in samples) of the end of the last detection.
+# The command listener starts reading from here so nothing said after the wake word is lost.
+detected_at = None
+
+def load():
+    """Loads the detector: starts the worker process, or loads the model in-process."""
+    global model, worker
+    print("⏳ Loading Wake Word Model...")
+    if USE_WORKER_PROCESS:
+        if worker is None:
+            settle = wakeword_engine.SETTLE_CHUNKS if verifier else 0
+            worker = wakeword_engine.WakeWordProcess(audio_capture.ring, THRESHOLD, ONNX_THREADS, settle)
+            worker.start()
+    elif model is None:
+        model = wakeword_engine.load_model(ONNX_THREADS)
+    print("✅ Wake Word Model Loaded")
+
+def verify_detection(pos, score, scores):
+    """Runs the optional second stage on the buffered wake audio and logs both scores."""
+    accepted, stage2, detail = True, None, None
+    if verifier is not None:
+        window = int(wakeword_verifier.VERIFY_WINDOW_S * RATE)
+        start = max(pos - window, audio_capture.ring.oldest_pos)
+        audio = audio_capture.ring.read(start, pos - start)
+        accepted, stage2, detail = verifier.verify(audio, scores)
+        if not accepted:
+            print(f"🚫 Wake word rejected by {verifier.name} verifier ({score:.2f} -> {stage2:.2f})")
+    if LOG_SCORES:
+        wakeword_verifier.log_detection(score, scores, verifier, accepted, stage2, detail)
+    return accepted
+
+def gate_stats():
+    """Energy gate statistics: gate-open ratio, inferences skipped, current noise floor."""
+    if USE_WORKER_PROCESS:
+        if worker is None:
+            return _worker_stats
+        worker.drain()
+        return worker.gate_stats
+    return gate.stats() if gate is not None else {}
+
+def shutdown():
+    """Stops the worker process (if any); gate_stats() then returns its final statistics."""
+    global worker, _worker_stats
+    if worker is not None:
+        worker.stop()
+        _worker_stats = worker.gate_stats
+        worker = None
 
 def listen_for_wake_word():
     """
     Listens continuously for the wake word 'Hey Mycroft'.
     Blocking call. Returns True when detected.
+    Reads from the shared microphone ring, so no audio device is opened here.
     """
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
+    global detected_at
+    load()
+    audio_capture.start_capture()
     
     # print("\n💤 Waiting for wake word ('Hey Mycroft')...")
     
     try:
+        # Ignore anything the worker heard before we started waiting
+        since = audio_capture.ring.write_pos
+        reader = None if USE_WORKER_PROCESS else audio_capture.get_reader()
         while True:
-            # Read audio chunk
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            audio_data = np.frombuffer(data, dtype=np.int16)
-            
-            # Feed to model
-            prediction = model.predict(audio_data)
-            
-            # Check for wake word
-            if prediction["hey_mycroft"] > THRESHOLD:
+            if USE_WORKER_PROCESS:
+                pos, score, _, scores = worker.wait_for_detection(after_pos=since)
+            else:
+                settle = wakeword_engine.SETTLE_CHUNKS if verifier else 0
+                pos, score, scores = wakeword_engine.scan(model, reader, THRESHOLD, gate=gate, settle_chunks=settle)
+            since = pos
+
+            if verify_detection(pos, score, scores):
                 # print("⚡ Wake Word Detected!")
+                detected_at = pos
                 return True
+            if model is not None:
+                model.reset()
                 
     except KeyboardInterrupt:
         return False
     finally:
-        stream.stop_stream()
-        stream.close()
-        audio.terminate()
         # Reset model buffer to avoid false triggers on next run
-        model.reset()
+        if model is not None:
+            model.reset()
 
 if __name__ == "__main__":
     while True:
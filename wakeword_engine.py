@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+import collections
+import logging
+import multiprocessing as mp
+import numpy as np
+
+# Kept free of audio_capture / model imports at module level, so the spawned
+# worker process only pays for what it actually uses.
+
+# Configuration
+WAKE_WORD = "hey_mycroft"
+CHUNK = 1280  # 80 ms at 16 kHz, what openwakeword expects
+THRESHOLD = 0.5
+ONNX_THREADS = 1  # Threads per ONNX session (melspectrogram / embedding / wake word)
+
+# Energy pre-gate: skip inference while the room is silent
+GATE_ENABLED = True
+GATE_MIN_RMS = 60.0  # Absolute floor (int16 units); quieter chunks never open the gate
+GATE_RATIO = 3.0  # Open when RMS is this many times the tracked noise floor (~ +10 dB)
+GATE_FLUX = 1.0  # ...or when the spectrum grows by this fraction (onset)
+GATE_HANG_S = 2.0  # Keep inferring this long after the last trigger
+GATE_LOOKBACK_S = 1.5  # Audio replayed into the model when the gate opens
+NOISE_ALPHA = 0.05  # Noise floor tracking speed (closed-gate chunks only)
+STATS_INTERVAL_S = 60  # How often the worker reports gate statistics
+SCORE_HISTORY = 10  # Recent per-chunk scores returned with a detection (for the verifier)
+SETTLE_CHUNKS = 3  # With a verifier, keep scoring this many chunks past the crossing (peak, not edge)
+
+
+def load_model(onnx_threads=ONNX_THREADS):
+    """Loads the openwakeword model (downloads automatically if not present)."""
+    from openwakeword.model import Model
+    logging.getLogger('openwakeword').setLevel(logging.ERROR)
+    return Model(wakeword_models=[WAKE_WORD], inference_framework="onnx", ncpu=onnx_threads)
+
+
+class EnergyGate:
+    """
+    Cheap RMS / spectral-flux gate in front of model.predict.
+    While the room is silent the model is not run at all. When the gate opens,
+    the last GATE_LOOKBACK_S of audio is replayed from the ring first, so the
+    model's feature buffer is primed exactly as if it had been running all along.
+    """
+
+    def __init__(self, rate=16000):
+        self.noise_floor = GATE_MIN_RMS
+        self.hang_chunks = int(GATE_HANG_S * rate / CHUNK)
+        self.lookback_chunks = int(GATE_LOOKBACK_S * rate / CHUNK)
+        self.open_for = 0
+        self._prev_spectrum = None
+        self.chunks_seen = 0
+        self.inferences_skipped = 0
+        self.openings = 0
+
+    def update(self, chunk):
+        """Returns 'open' (gate just opened), 'on' (still open) or 'off' for this chunk."""
+        self.chunks_seen += 1
+        x = chunk.astype(np.float32)
+        rms = float(np.sqrt(np.mean(x * x)))
+        spectrum = np.abs(np.fft.rfft(x))
+        if self._prev_spectrum is None:
+            flux = 0.0
+        else:
+            flux = float(np.maximum(spectrum - self._prev_spectrum, 0).sum() / (self._prev_spectrum.sum() + 1e-6))
+        self._prev_spectrum = spectrum
+
+        triggered = rms > GATE_MIN_RMS and (rms > self.noise_floor * GATE_RATIO or flux > GATE_FLUX)
+        was_open = self.open_for > 0
+        if triggered:
+            self.open_for = self.hang_chunks
+        elif was_open:
+            self.open_for -= 1
+
+        if self.open_for == 0:
+            self.noise_floor += NOISE_ALPHA * (max(rms, 1.0) - self.noise_floor)
+            self.inferences_skipped += 1
+            return "off"
+        if not was_open:
+            self.openings += 1
+            return "open"
+        return "on"
+
+    def stats(self):
+        seen = max(self.chunks_seen, 1)
+        return {
+            "chunks_seen": self.chunks_seen,
+            "inferences_skipped": self.inferences_skipped,
+            "gate_open_ratio": (self.chunks_seen - self.inferences_skipped) / seen,
+            "openings": self.openings,
+            "noise_floor_rms": self.noise_floor,
+        }
+
+
+def scan(model, reader, threshold=THRESHOLD, stop_event=None, gate=None, until=None, settle_chunks=0):
+    """
+    Feeds CHUNK-sized frames from reader to the model until the score crosses threshold.
+    With a gate, silent chunks are skipped and the look-back is replayed when it opens.
+    settle_chunks more chunks are scored after the crossing so recent scores include the peak.
+    Returns (capture position at the end of the detecting chunk, score, recent scores),
+    or None if stop_event was set or the monotonic deadline until passed first.
+    """
+    recent = collections.deque(maxlen=SCORE_HISTORY)
+    while stop_event is None or not stop_event.is_set():
+        if until is not None and time.monotonic() >= until:
+            return None
+        audio_data = reader.read(CHUNK, timeout=0.5)
+        if audio_data is None:
+            continue
+
+        state = gate.update(audio_data) if gate is not None else "on"
+        if state == "off":
+            continue
+
+        if state == "open":
+            # Prime the feature buffer with the audio we skipped just before the onset
+            model.reset()
+            recent.clear()
+            start = max(reader.pos - CHUNK * (gate.lookback_chunks + 1), reader.ring.oldest_pos)
+            for pos in range(start, reader.pos - CHUNK, CHUNK):
+                score = model.predict(reader.ring.read(pos, CHUNK))[WAKE_WORD]
+                recent.append(float(score))
+                if score > threshold:
+                    return _settle(model, reader, pos + CHUNK, score, recent, settle_chunks)
+
+        score = model.predict(audio_data)[WAKE_WORD]
+        recent.append(float(score))
+        if score > threshold:
+            return _settle(model, reader, reader.pos, score, recent, settle_chunks)
+    return None
+
+
+def _settle(model, reader, pos, score, recent, settle_chunks):
+    """Scores up to settle_chunks more chunks after a crossing, then builds scan's result."""
+    for _ in range(settle_chunks):
+        audio_data = reader.read(CHUNK, timeout=0.5)
+        if audio_data is None:
+            break
+        recent.append(float(model.predict(audio_data)[WAKE_WORD]))
+    # Position stays at the crossing: the settle chunks are the start of the command
+    return pos, score, list(recent)
+
+
+def _worker_main(ring_name, capacity, conn, stop_event, threshold, onnx_threads, settle_chunks):
+    """Entry point of the detector process: attach to the mic ring, detect, report."""
+    os.environ.setdefault("OMP_NUM_THREADS", str(onnx_threads))
+    from ring_buffer import SharedAudioRing
+
+    ring = SharedAudioRing(capacity, name=ring_name)
+    model = load_model(onnx_threads)
+    reader = ring.reader()
+    gate = EnergyGate() if GATE_ENABLED else None
+    conn.send(("ready", time.time()))
+
+    next_report = time.monotonic() + STATS_INTERVAL_S
+    try:
+        while not stop_event.is_set():
+            # Return at least every STATS_INTERVAL_S, even in silence, to report gate statistics
+            result = scan(model, reader, threshold, stop_event, gate, next_report, settle_chunks)
+            if time.monotonic() >= next_report:
+                next_report += STATS_INTERVAL_S
+                if gate is not None:
+                    conn.send(("stats", gate.stats()))
+            if result is None:
+                continue
+            pos, score, recent = result
+            if gate is not None:
+                conn.send(("stats", gate.stats()))  # Fresh counters for every wake cycle
+            conn.send(("detection", pos, float(score), time.time(), recent))
+            # Reset model buffer to avoid re-triggering on the same utterance
+            model.reset()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if gate is not None:
+            try:
+                conn.send(("stats", gate.stats()))  # Final counters, picked up by stop()
+            except (OSError, ValueError):
+                pass
+        ring.close()
+
+
+class WakeWordProcess:
+    """
+    Runs openwakeword in its own process so ONNX inference never competes for the
+    GIL with the playback callback or Whisper. The process reads mic frames from
+    the shared-memory capture ring and posts (position, score, timestamp, recent scores)
+    detections back over a pipe.
+    """
+
+    def __init__(self, ring, threshold=THRESHOLD, onnx_threads=ONNX_THREADS, settle_chunks=0):
+        self.ring = ring
+        self.threshold = threshold
+        self.onnx_threads = onnx_threads
+        self.settle_chunks = settle_chunks
+        self._process = None
+        self._conn = None
+        self._stop = None
+        self.gate_stats = {}  # Latest energy gate statistics reported by the worker
+
+    def start(self):
+        if self._process is not None:
+            return
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe(duplex=False)
+        self._stop = ctx.Event()
+        self._process = ctx.Process(
+            target=_worker_main,
+            args=(self.ring.name, self.ring.capacity, child_conn, self._stop,
+                  self.threshold, self.onnx_threads, self.settle_chunks),
+            daemon=True,
+        )
+        # spawn re-runs the parent's __main__ script in the child (as __mp_main__): the whole
+        # app, with its mic ring, TTS and agents. The worker needs none of it, so this light
+        # module stands in as __main__ while the child is being set up.
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            self._process.start()
+        finally:
+            sys.modules["__main__"] = main
+        self._conn.recv()  # Wait until the model is loaded
+        print(f"✅ Wake Word worker ready (pid {self._process.pid})")
+
+    def wait_for_detection(self, after_pos=0, timeout=None):
+        """
+        Blocks until the worker reports a detection later than after_pos.
+        Returns (position, score, timestamp, recent scores) or None on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._conn.poll(remaining):
+                return None
+            msg = self._conn.recv()
+            if msg[0] == "stats":
+                self.gate_stats = msg[1]
+            elif msg[0] == "detection" and msg[1] > after_pos:
+                return msg[1:]
+
+    def drain(self):
+        """
+        Reads what the worker has sent while nobody was waiting for a detection, keeping
+        the latest statistics. Detections found here are stale and dropped.
+        """
+        try:
+            while self._conn is not None and self._conn.poll(0):
+                msg = self._conn.recv()
+                if msg[0] == "stats":
+                    self.gate_stats = msg[1]
+        except (EOFError, OSError):
+            pass
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout=2)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self.drain()  # The worker's final statistics
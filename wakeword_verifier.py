@@ -0,0 +1,192 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import wave
+import numpy as np
+
+# Configuration
+RATE = 16000
+VERIFY_WINDOW_S = 2.0  # Wake audio (before the detection point) handed to the verifier
+
+# Smoothed re-score: the mean of the best few recent chunk scores must clear a higher bar
+SMOOTH_TOP_K = 3
+SMOOTH_THRESHOLD = 0.7
+
+# Whisper keyword check
+WHISPER_SIZE = "tiny"
+# How tiny Whisper tends to spell "Mycroft"
+KEYWORD_RE = re.compile(r"\b(my ?croft|my ?craft|mike ?roft|micro ?soft|micro ?ft|my ?crow ?ft)\b", re.IGNORECASE)
+
+SCORE_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wakeword_scores.jsonl")
+
+
+class SmoothedVerifier:
+    """Re-scores a detection from the stage-1 scores around it, smoothed over several chunks."""
+
+    name = "smoothed"
+
+    def __init__(self, top_k=SMOOTH_TOP_K, threshold=SMOOTH_THRESHOLD):
+        self.top_k = top_k
+        self.threshold = threshold
+
+    def verify(self, audio, scores):
+        """Returns (accepted, score, detail)."""
+        best = sorted(scores, reverse=True)[:self.top_k]
+        score = float(np.mean(best)) if best else 0.0
+        return score >= self.threshold, score, None
+
+
+class WhisperKeywordVerifier:
+    """Transcribes the buffered wake audio with a tiny Whisper and looks for the keyword."""
+
+    name = "whisper"
+
+    def __init__(self, size=WHISPER_SIZE):
+        self.size = size
+        self._model = None
+
+    def load(self):
+        if self._model is None:
+            import whisper_backend
+            self._model = whisper_backend.load_model(self.size, device="cpu")
+        return self._model
+
+    def verify(self, audio, scores):
+        """Returns (accepted, score, transcript)."""
+        segments, _ = self.load().transcribe(
+            audio.astype(np.float32) / 32768.0,
+            beam_size=1,
+            language="en",
+            initial_prompt="Hey Mycroft.",
+            condition_on_previous_text=False,
+            without_timestamps=True,
+        )
+        text = " ".join(seg.text for seg in segments).strip()
+        accepted = bool(KEYWORD_RE.search(text))
+        return accepted, 1.0 if accepted else 0.0, text
+
+
+VERIFIERS = {"smoothed": SmoothedVerifier, "whisper": WhisperKeywordVerifier}
+
+def make_verifier(name):
+    """Builds a verifier by name ('smoothed', 'whisper'), or None for no second stage."""
+    return VERIFIERS[name]() if name else None
+
+
+def log_detection(stage1_score, scores, verifier, accepted, stage2_score, detail, path=SCORE_LOG):
+    """Appends one detection (both stages) to the JSONL score log."""
+    record = {
+        "time": time.time(),
+        "stage1_score": round(float(stage1_score), 4),
+        "recent_scores": [round(s, 4) for s in scores],
+        "verifier": verifier.name if verifier else None,
+        "accepted": accepted,
+        "stage2_score": None if stage2_score is None else round(float(stage2_score), 4),
+        "detail": detail,
+    }
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        print(f"⚠️ Could not write wake word score log: {e}")
+
+
+def _load_wav(path):
+    """Reads a WAV file as 16 kHz mono int16 (linear resampling if needed)."""
+    with wave.open(path, "rb") as wf:
+        rate, channels, width = wf.getframerate(), wf.getnchannels(), wf.getsampwidth()
+        data = wf.readframes(wf.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit WAV is supported")
+    audio = np.frombuffer(data, dtype=np.int16).reshape(-1, channels).mean(axis=1)
+    if rate != RATE:
+        positions = np.arange(0, len(audio), rate / RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return audio.astype(np.int16)
+
+
+class _Exhausted:
+    """Stands in for scan's stop_event: set once a file has been fully scanned."""
+
+    def __init__(self, reader, chunk):
+        self.reader = reader
+        self.chunk = chunk
+
+    def is_set(self):
+        return self.reader.available() < self.chunk
+
+
+def evaluate(labelled_dir, threshold=None, verifier_name="smoothed"):
+    """
+    Measures false-accept and false-reject rates on a labelled set:
+    labelled_dir/positive/*.wav contain the wake word, labelled_dir/negative/*.wav don't.
+    Reports stage 1 alone and stage 1 + verifier.
+    """
+    import wakeword_engine
+    from ring_buffer import AudioRingBuffer
+
+    threshold = wakeword_engine.THRESHOLD if threshold is None else threshold
+    model = wakeword_engine.load_model()
+    verifier = make_verifier(verifier_name)
+    settle = wakeword_engine.SETTLE_CHUNKS if verifier else 0
+    pad = np.zeros(RATE, dtype=np.int16)
+
+    counts = {label: {"files": 0, "stage1": 0, "stage2": 0} for label in ("positive", "negative")}
+    for label in counts:
+        for path in sorted(glob.glob(os.path.join(labelled_dir, label, "*.wav"))):
+            audio = np.concatenate([pad, _load_wav(path), pad])
+            ring = AudioRingBuffer(len(audio))
+            ring.write(audio)
+            reader = ring.reader(0)
+            model.reset()
+
+            done = _Exhausted(reader, wakeword_engine.CHUNK)
+
+            hit1 = hit2 = False
+            while not done.is_set():
+                result = wakeword_engine.scan(model, reader, threshold, done, settle_chunks=settle)
+                if result is None:
+                    break
+                pos, score, scores = result
+                hit1 = True
+                if verifier is None:
+                    hit2 = True
+                    break
+                window = ring.read(max(0, pos - int(VERIFY_WINDOW_S * RATE)), min(pos, int(VERIFY_WINDOW_S * RATE)))
+                accepted, stage2, detail = verifier.verify(window, scores)
+                print(f"  {os.path.basename(path)}: stage1 {score:.2f} -> {verifier.name} {stage2:.2f} "
+                      f"{'accept' if accepted else 'reject'}{f' ({detail})' if detail else ''}")
+                if accepted:
+                    hit2 = True
+                    break
+                model.reset()
+
+            counts[label]["files"] += 1
+            counts[label]["stage1"] += hit1
+            counts[label]["stage2"] += hit2
+
+    pos_n = max(counts["positive"]["files"], 1)
+    neg_n = max(counts["negative"]["files"], 1)
+    print(f"\nThreshold {threshold}, verifier: {verifier_name or 'none'}")
+    print(f"{'':>18} {'false reject':>13} {'false accept':>13}")
+    for stage, label in (("stage1", "stage 1"), ("stage2", "stage 1 + 2")):
+        fr = 1 - counts["positive"][stage] / pos_n
+        fa = counts["negative"][stage] / neg_n
+        print(f"{label:>18} {fr:>12.1%} {fa:>12.1%}")
+    return counts
+
+
+if __name__ == "__main__":
+    # Usage: python wakeword_verifier.py <labelled_dir> [threshold] [smoothed|whisper|none]
+    if len(sys.argv) < 2:
+        print("Usage: python wakeword_verifier.py <labelled_dir> [threshold] [smoothed|whisper|none]")
+        sys.exit(1)
+    name = sys.argv[3] if len(sys.argv) > 3 else "smoothed"
+    evaluate(
+        sys.argv[1],
+        threshold=float(sys.argv[2]) if len(sys.argv) > 2 else None,
+        verifier_name=None if name == "none" else name,
+    )
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import tts
+import tts_scheduler
+
+# Configuration
+OLLAMA_KEEP_ALIVE = "30m"  # How long Ollama keeps the model loaded after the warm-up request
+# Synthesized once at startup and thrown away (never played). Long enough to measure how
+# fast the engine produces audio, which the jitter buffer then needs for the first answer.
+WARMUP_PHRASE = "Warming up the voice, so the very first answer can start without a pause."
+TIMELINE_WIDTH = 40  # Characters of the widest bar in the startup timeline
+
+
+class StartupTimeline:
+    """Start / end of each startup component, relative to when the timeline was created."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans = {}  # name -> (start_s, end_s, error or None)
+
+    async def run(self, name, awaitable):
+        """Awaits one component, recording how long it took. Failures are recorded, not raised."""
+        start = time.perf_counter() - self.t0
+        error = None
+        try:
+            return await awaitable
+        except Exception as e:
+            error = e
+            print(f"⚠️ Warm-up of {name} failed: {e}")
+        finally:
+            self.spans[name] = (start, time.perf_counter() - self.t0, error)
+
+    def report(self):
+        if not self.spans:
+            return
+        total = max(end for _, end, _ in self.spans.values()) or 1e-9
+        width = max(len(name) for name in self.spans)
+        print(f"⏱️ Startup timeline ({total:.2f}s until everything was warm):")
+        for name, (start, end, error) in sorted(self.spans.items(), key=lambda item: item[1][0]):
+            left = int(start / total * TIMELINE_WIDTH)
+            bar = " " * left + "█" * max(1, int(end / total * TIMELINE_WIDTH) - left)
+            status = "❌" if error is not None else "✅"
+            print(f"   {name:<{width}} {start:6.2f} → {end:6.2f}s {status} |{bar:<{TIMELINE_WIDTH}}|")
+
+
+async def warm_groq(model):
+    """One-token request: opens (and keeps) the TLS connection to Groq in the client's pool."""
+    await model.ainvoke("Hi", max_tokens=1)
+
+
+async def warm_ollama(model, keep_alive=OLLAMA_KEEP_ALIVE):
+    """Empty generate request: makes Ollama load the model into memory without generating."""
+    from ollama import AsyncClient
+
+    await AsyncClient(host=model.base_url).generate(model=model.model, keep_alive=keep_alive)
+
+
+async def warm_tts(phrases, voice, jitter=tts_scheduler.jitter):
+    """
+    Connects / loads the TTS engines, fills the phrase cache, then warms up the voice.
+    The warm-up synthesis also seeds jitter's production-rate estimate.
+    """
+    await tts.prewarm(phrases, voice)
+    # Goes around the phrase cache and the speaker: only the server-side warm-up is wanted
+    received, first_at, first_len = 0, None, 0
+    async for pcm in tts.router.stream(WARMUP_PHRASE, voice):
+        samples = len(pcm) // 2  # PCM16
+        if first_at is None:
+            first_at, first_len = time.monotonic(), samples
+        received += samples
+    jitter.finished(WARMUP_PHRASE, received, first_at, first_len, time.monotonic())
+
+
+async def warm_up(timeline, components):
+    """
+    Runs every component's warm-up concurrently (blocking loads should be wrapped in
+    asyncio.to_thread) and prints the timeline once all of them have finished.
+    components maps a name to an awaitable.
+    """
+    await asyncio.gather(*(timeline.run(name, awaitable) for name, awaitable in components.items()))
+    timeline.report()
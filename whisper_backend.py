@@ -0,0 +1,155 @@
+import os
+import sys
+import json
+import glob
+import time
+import platform
+import numpy as np
+from faster_whisper import WhisperModel, decode_audio
+
+# Constants
+RATE = 16000
+DEVICE = "auto"  # "auto", "cuda" or "cpu"
+
+# GPU backend (what stt_vad always used)
+GPU_MODEL_SIZE = "medium"
+GPU_COMPUTE_TYPE = "float16"
+
+# CPU backend for GPU-less edge boxes
+CPU_COMPUTE_TYPE = "int8"  # "int8" or "int8_float32"
+CPU_THREADS = 0  # 0 = let CTranslate2 decide
+CPU_MODEL_SIZES = ["tiny", "base", "small", "medium"]  # Smallest first
+TARGET_RTF = 0.5  # Largest model whose decode time / audio time stays under this wins
+
+# Decode settings used by every production transcribe call (stt_vad), and timed as-is by
+# the probe and the benchmark, so the RTF they measure is the RTF the assistant gets
+DECODE_OPTIONS = {"beam_size": 5}  # faster-whisper's default
+
+# Startup probe
+PROBE_AUDIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Research", "speech_to_text", "audio.mp3")
+PROBE_SECONDS = 5
+PROBE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".stt_probe.json")
+
+
+def cuda_available():
+    """True if CTranslate2 can see a CUDA device."""
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count() > 0
+    except Exception:
+        return False
+
+def load_model(size, device="cpu", compute_type=None, cpu_threads=CPU_THREADS):
+    """Loads a WhisperModel with the compute type that suits the device."""
+    if compute_type is None:
+        compute_type = GPU_COMPUTE_TYPE if device == "cuda" else CPU_COMPUTE_TYPE
+    return WhisperModel(size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+def measure_rtf(model, audio):
+    """Real-time factor of one decode: seconds spent / seconds of audio."""
+    start = time.perf_counter()
+    segments, _ = model.transcribe(audio, **DECODE_OPTIONS)
+    list(segments)  # Segments are lazy, force the full decode
+    return (time.perf_counter() - start) / (len(audio) / RATE)
+
+def _probe_audio():
+    """A few seconds of real speech to time the decode on (noise if the sample is missing)."""
+    try:
+        audio = decode_audio(PROBE_AUDIO, sampling_rate=RATE)
+        return audio[:RATE * PROBE_SECONDS]
+    except Exception:
+        return (np.random.default_rng(0).standard_normal(RATE * PROBE_SECONDS) * 0.05).astype(np.float32)
+
+def _machine_key():
+    # Includes the decode options: results probed with other settings don't apply
+    options = json.dumps(DECODE_OPTIONS, sort_keys=True)
+    return f"{platform.machine()}-{os.cpu_count()}-{CPU_COMPUTE_TYPE}-{CPU_THREADS}-{TARGET_RTF}-{options}"
+
+def probe_model_size(target_rtf=TARGET_RTF):
+    """
+    Picks the largest CPU model size whose RTF stays under target_rtf on this machine.
+    Sizes are tried smallest first and the probe stops at the first one that is too slow.
+    The result is cached per machine, so only the first boot pays for it.
+    Returns (size, model) with the chosen model already loaded.
+    """
+    try:
+        with open(PROBE_CACHE) as f:
+            cached = json.load(f).get(_machine_key())
+        if cached:
+            print(f"🧪 Using cached STT probe result: {cached}")
+            return cached, load_model(cached)
+    except Exception:
+        pass
+
+    audio = _probe_audio()
+    chosen, chosen_model = None, None
+    for size in CPU_MODEL_SIZES:
+        candidate = load_model(size)
+        measure_rtf(candidate, audio[:RATE])  # First decode pays one-off setup costs
+        rtf = measure_rtf(candidate, audio)
+        print(f"🧪 Whisper {size} ({CPU_COMPUTE_TYPE}, cpu): RTF {rtf:.2f}")
+        if rtf > target_rtf and chosen is not None:
+            break
+        chosen, chosen_model = size, candidate
+        if rtf > target_rtf:
+            break  # Even the smallest model is too slow, use it anyway
+
+    try:
+        with open(PROBE_CACHE, "w") as f:
+            json.dump({_machine_key(): chosen}, f)
+    except Exception:
+        pass
+
+    return chosen, chosen_model
+
+def load_default_model():
+    """GPU: the medium float16 model as before. CPU: int8 model sized by the RTF probe."""
+    device = DEVICE
+    if device == "auto":
+        device = "cuda" if cuda_available() else "cpu"
+
+    if device == "cuda":
+        print(f"⏳ Loading Whisper Model ({GPU_MODEL_SIZE}, cuda, {GPU_COMPUTE_TYPE})...")
+        return load_model(GPU_MODEL_SIZE, device="cuda")
+
+    print(f"⏳ Probing Whisper model size for CPU (target RTF {TARGET_RTF})...")
+    size, model = probe_model_size()
+    print(f"⏳ Using Whisper Model ({size}, cpu, {CPU_COMPUTE_TYPE})")
+    return model
+
+def benchmark(corpus_dir, device="cpu", compute_type=None, cpu_threads=CPU_THREADS, sizes=None):
+    """Reports the RTF of each model size over every WAV file in corpus_dir."""
+    files = sorted(glob.glob(os.path.join(corpus_dir, "**", "*.wav"), recursive=True))
+    if not files:
+        print(f"No WAV files found in {corpus_dir}")
+        return {}
+
+    clips = [decode_audio(path, sampling_rate=RATE) for path in files]
+    total_s = sum(len(c) for c in clips) / RATE
+    print(f"📂 {len(files)} files, {total_s:.1f}s of audio")
+
+    results = {}
+    for size in sizes or CPU_MODEL_SIZES:
+        model = load_model(size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+        measure_rtf(model, clips[0][:RATE])  # Warm-up
+        start = time.perf_counter()
+        for clip in clips:
+            segments, _ = model.transcribe(clip, **DECODE_OPTIONS)
+            list(segments)
+        results[size] = (time.perf_counter() - start) / total_s
+        print(f"{size:>8}: RTF {results[size]:.3f}")
+        del model
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python whisper_backend.py <wav_dir> [cpu|cuda] [compute_type] [threads]
+    if len(sys.argv) < 2:
+        print("Usage: python whisper_backend.py <wav_dir> [cpu|cuda] [compute_type] [threads]")
+        sys.exit(1)
+    benchmark(
+        sys.argv[1],
+        device=sys.argv[2] if len(sys.argv) > 2 else "cpu",
+        compute_type=sys.argv[3] if len(sys.argv) > 3 else None,
+        cpu_threads=int(sys.argv[4]) if len(sys.argv) > 4 else CPU_THREADS,
+    )
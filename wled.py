@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import httpx
+
+# Configuration
+WLED_HOST = os.getenv("WLED_HOST", "192.168.1.20")
+TIMEOUT_S = 2.0  # Whole request
+CONNECT_TIMEOUT_S = 0.5  # The strip is on the LAN: if it doesn't accept by then, it's off
+DOWN_START_S = 5.0  # How long an unreachable strip is skipped, doubling per failure...
+DOWN_MAX_S = 120.0  # ...up to this
+
+# Color mapping
+COLORS = {
+    "red": [255, 0, 0], "green": [0, 255, 0], "blue": [0, 0, 255],
+    "white": [255, 255, 255], "warm white": [255, 244, 229],
+    "cool white": [212, 235, 255], "yellow": [255, 255, 0],
+    "cyan": [0, 255, 255], "magenta": [255, 0, 255],
+    "purple": [128, 0, 128], "orange": [255, 165, 0],
+    "pink": [255, 192, 203]
+}
+
+
+def build_state(power=None, brightness=None, color=None, preset=None):
+    """WLED JSON state for the given changes (empty dict if there are none)."""
+    state = {}
+
+    if power is not None:
+        state["on"] = power
+
+    if brightness is not None:
+        state["bri"] = max(0, min(255, brightness))
+
+    if preset is not None:
+        state["ps"] = preset
+
+    if color:
+        rgb = None
+        color_lower = color.lower().strip()
+        if color_lower in COLORS:
+            rgb = COLORS[color_lower]
+        elif color_lower.startswith("#") and len(color_lower) == 7:
+            try:
+                # Hex to RGB
+                h = color_lower.lstrip('#')
+                rgb = tuple(int(h[i:i+2], 16) for i in (0, 2, 4))
+            except ValueError:
+                pass
+
+        if rgb:
+            # Set primary color for all segments
+            state["seg"] = [{"col": [rgb]}]
+
+    return state
+
+
+class Circuit:
+    """
+    Backoff for an unreachable strip: after a failed request, requests are refused
+    (instantly, without touching the network) for DOWN_START_S, doubling per
+    consecutive failure up to DOWN_MAX_S. Shared by the sync and async clients.
+    """
+
+    def __init__(self, start_s=DOWN_START_S, max_s=DOWN_MAX_S):
+        self.start_s = start_s
+        self.max_s = max_s
+        self.failures = 0
+        self.down_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        return time.monotonic() >= self.down_until
+
+    def retry_in(self):
+        return max(0.0, self.down_until - time.monotonic())
+
+    def succeeded(self):
+        with self._lock:
+            self.failures = 0
+            self.down_until = 0.0
+
+    def failed(self):
+        """Opens the circuit; returns for how long."""
+        with self._lock:
+            self.failures += 1
+            down = min(self.start_s * 2 ** (self.failures - 1), self.max_s)
+            self.down_until = time.monotonic() + down
+            return down
+
+
+circuit = Circuit()
+
+
+def _timeout():
+    return httpx.Timeout(TIMEOUT_S, connect=CONNECT_TIMEOUT_S)
+
+
+def _result(host, state, response=None, error=None):
+    if error is not None:
+        return f"Failed to connect to WLED at {host}: {error}"
+    if response.status_code == 200:
+        return f"Success: WLED state updated to {json.dumps(state)}"
+    return f"Error: WLED returned status {response.status_code}"
+
+
+def _skipped(host):
+    return f"Failed to connect to WLED at {host}: unreachable, not retrying for {circuit.retry_in():.0f}s"
+
+
+def _report_failure(host, error):
+    down = circuit.failed()
+    print(f"💡 WLED at {host} unreachable ({error or type(error).__name__}); skipping it for {down:.0f}s")
+
+
+_sync_client = None
+_sync_lock = threading.Lock()
+
+
+def post_state(state, host=WLED_HOST):
+    """Blocking request over a kept-alive connection (for tools running in worker threads)."""
+    global _sync_client
+    if not circuit.allow():
+        return _skipped(host)
+    with _sync_lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(timeout=_timeout(), verify=False)
+    try:
+        response = _sync_client.post(f"http://{host}/json/state", json=state)
+    except httpx.HTTPError as e:
+        _report_failure(host, e)
+        return _result(host, state, error=e)
+    circuit.succeeded()
+    return _result(host, state, response)
+
+
+class WLEDClient:
+    """
+    Async WLED client for status lights on the voice pipeline's event loop.
+    update() is fire-and-forget: it returns at once, and a single background sender
+    posts states one at a time over a kept-alive connection. Updates made while a
+    request is in flight are coalesced, so only the latest one is sent next. While
+    the circuit is open, updates are dropped without waiting on the network.
+    """
+
+    def __init__(self, host=WLED_HOST):
+        self.host = host
+        self.url = f"http://{host}/json/state"
+        self.sent = 0
+        self.coalesced = 0  # Updates replaced by a newer one before being sent
+        self.skipped = 0  # Updates dropped because the strip was unreachable
+        self._client = None
+        self._pending = None
+        self._sender = None
+
+    def _http(self):
+        if self._client is None:
+            # Plain HTTP only: skipping TLS setup avoids loading the CA bundle on the event loop (~200 ms)
+            self._client = httpx.AsyncClient(
+                timeout=_timeout(), verify=False, limits=httpx.Limits(max_keepalive_connections=1)
+            )
+        return self._client
+
+    async def send(self, state):
+        """Posts state now and returns the tool-style result string."""
+        if not circuit.allow():
+            self.skipped += 1
+            return _skipped(self.host)
+        try:
+            response = await self._http().post(self.url, json=state)
+        except httpx.HTTPError as e:
+            _report_failure(self.host, e)
+            return _result(self.host, state, error=e)
+        circuit.succeeded()
+        self.sent += 1
+        return _result(self.host, state, response)
+
+    def update(self, state=None, **changes):
+        """Queues state (or build_state(**changes)) to be sent in the background."""
+        state = state if state is not None else build_state(**changes)
+        if self._pending is not None:
+            self.coalesced += 1
+        self._pending = state
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send_pending())
+
+    async def _send_pending(self):
+        while self._pending is not None:
+            state, self._pending = self._pending, None
+            await self.send(state)
+
+    def stats(self):
+        return {"sent": self.sent, "coalesced": self.coalesced, "skipped": self.skipped,
+                "failures": circuit.failures}
+
+    async def close(self):
+        """Sends what is still queued (unless the strip is down), then closes the connection."""
+        if self._sender is not None:
+            await self._sender
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+if __name__ == "__main__":
+    # Local stand-in for a WLED strip: records every state it receives
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    received = []
+    connections = set()
+
+    class StandIn(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real firmware
+        delay_s = 0.05
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(self.delay_s)
+            received.append(json.loads(body))
+            connections.add(self.client_address)
+            reply = b'{"success":true}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_address[1]}"
+
+    async def demo():
+        lights = WLEDClient(host)
+
+        # Burst of updates while one is in flight: they collapse into the latest
+        blocked = 0.0
+        for i, color in enumerate(["red", "green", "blue", "cyan", "purple", "orange"]):
+            start = time.perf_counter()
+            lights.update(color=color)
+            blocked += time.perf_counter() - start
+            if i == 0:
+                await asyncio.sleep(0.01)  # Let the first request go out
+        blocked_ms = blocked * 1000
+        await lights.close()
+        assert [s["seg"][0]["col"][0] for s in received] == [COLORS["red"], COLORS["orange"]], received
+        print(f"✅ 6 updates -> {len(received)} requests (first and latest), caller blocked {blocked_ms:.2f} ms")
+
+        # Keep-alive: sequential requests reuse one connection
+        for preset in (1, 2, 3):
+            print(f"   {await lights.send(build_state(preset=preset))}")
+        assert len(connections) <= 2, connections  # One per client instance
+        print(f"✅ {len(received)} requests over {len(connections)} connection(s)")
+        await lights.close()
+
+        # Strip goes away: one failed request opens the circuit, later updates cost nothing
+        server.shutdown()
+        server.server_close()
+        lights = WLEDClient(host)
+        print(f"   {await lights.send(build_state(power=True))}")
+        start = time.perf_counter()
+        for _ in range(100):
+            lights.update(preset=1)
+            await asyncio.sleep(0)
+        await lights.close()
+        print(f"✅ Strip down: 100 updates in {(time.perf_counter() - start) * 1000:.1f} ms, {lights.stats()}")
+
+    asyncio.run(demo())